@@ -156,6 +156,7 @@ async def shutdown_handler(bot: BallsDexBot, signal_type: str | None = None):
     try:
         await asyncio.wait_for(bot.close(), timeout=10)
     finally:
+        bot.render_pool.shutdown()
         pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
         [task.cancel() for task in pending]
         try:
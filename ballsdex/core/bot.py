@@ -23,9 +23,20 @@ from prometheus_client import Histogram
 from rich import box, print
 from rich.console import Console
 from rich.table import Table
+from tortoise.timezone import now as datetime_now
 
 from ballsdex.core.commands import Core
 from ballsdex.core.dev import Dev
+from ballsdex.core.image_generator.image_gen import (
+    CacheSizes,
+    CardFormat,
+    CardTemplate,
+    base_layers_capacity,
+    card_cache,
+    clear_asset_stamps,
+    clear_base_layers,
+)
+from ballsdex.core.image_generator.render_pool import RenderPool, RenderPoolBusy
 from ballsdex.core.metrics import PrometheusServer
 from ballsdex.core.models import (
     Ball,
@@ -34,9 +45,15 @@ from ballsdex.core.models import (
     Economy,
     Regime,
     Special,
+    ball_sampler,
     balls,
+    catch_names,
     economies,
+    guild_configs,
+    inventories,
+    players,
     regimes,
+    special_schedule,
     specials,
 )
 from ballsdex.settings import settings
@@ -170,6 +187,25 @@ class BallsDexBot(commands.AutoShardedBot):
         self.catch_log: set[int] = set()
         self.command_log: set[int] = set()
         self.locked_balls = TTLCache(maxsize=99999, ttl=60 * 30)
+        # bumped by load_cache, so that indexes built from the cache know they are outdated
+        self.cache_version = 0
+
+        card_cache.configure(
+            settings.card_cache_size * 1024 * 1024,
+            Path(settings.card_cache_directory) if settings.card_cache_directory else None,
+            settings.card_cache_directory_size * 1024 * 1024,
+        )
+        self.render_pool = RenderPool(
+            settings.render_pool_type,
+            settings.render_pool_workers,
+            settings.render_queue_size,
+            CardFormat(settings.card_format, settings.card_quality, settings.card_scale),
+            CacheSizes(
+                settings.asset_cache_size * 1024 * 1024,
+                settings.base_layer_cache_size * 1024 * 1024,
+                settings.text_cache_size * 1024 * 1024,
+            ),
+        )
 
         self.owner_ids: set
 
@@ -219,6 +255,8 @@ class BallsDexBot(commands.AutoShardedBot):
         balls.clear()
         for ball in await Ball.all():
             balls[ball.pk] = ball
+        ball_sampler.build((x for x in balls.values() if x.enabled), lambda x: x.rarity)
+        catch_names.build(balls.values())
         table.add_row(settings.collectible_name.title() + "s", str(len(balls)))
 
         regimes.clear()
@@ -234,8 +272,28 @@ class BallsDexBot(commands.AutoShardedBot):
         specials.clear()
         for special in await Special.all():
             specials[special.pk] = special
+        special_schedule.build(specials.values())
         table.add_row("Special events", str(len(specials)))
 
+        # assets may have been replaced, pre-rendered card layers and cards may be outdated now
+        clear_asset_stamps()
+        clear_base_layers()
+        capacity = base_layers_capacity(not self.render_pool.output.transparent)
+        enabled = sum(1 for ball in balls.values() if ball.enabled)
+        if capacity < enabled:
+            log.warning(
+                f"Only about {capacity} of the {enabled} enabled cards fit in the base layer "
+                "cache, the others are drawn again from scratch when evicted. Raise "
+                '"base-layer-cache-size" in the card rendering settings to avoid this.'
+            )
+        card_cache.clear()
+        # configs and players may have been edited from the admin panel
+        guild_configs.clear()
+        players.clear()
+        inventories.clear()
+        # autocompletion search indexes are rebuilt on their next use
+        self.cache_version += 1
+
         self.blacklist = set()
         for blacklisted_id in await BlacklistedID.all().only("discord_id"):
             self.blacklist.add(blacklisted_id.discord_id)
@@ -246,10 +304,32 @@ class BallsDexBot(commands.AutoShardedBot):
             self.blacklist_guild.add(blacklisted_id.discord_id)
         table.add_row("Blacklisted guilds", str(len(self.blacklist_guild)))
 
+        if settings.card_warmup:
+            if self.render_pool.start_warmup(self.get_warmup_templates):
+                table.add_row("Card warmup", "Started in background")
+
         log.info("Cache loaded, summary displayed below:")
         console = Console()
         console.print(table)
 
+    def get_warmup_templates(self) -> list[CardTemplate]:
+        """
+        List the cards to pre-render after loading the cache: the most common enabled balls
+        with their regime and running special backgrounds, as many as fit in the cache.
+
+        This reads the asset files and is called from a thread by the render pool.
+        """
+        running_specials = special_schedule.running(datetime_now())
+        templates: list[CardTemplate] = []
+        for ball in sorted(balls.values(), key=lambda x: x.rarity, reverse=True):
+            if not ball.enabled:
+                continue
+            templates.append(CardTemplate.from_ball(ball, "." + ball.cached_regime.background))
+            for special in running_specials:
+                background = special.background or ball.collection_card
+                templates.append(CardTemplate.from_ball(ball, "." + background))
+        return templates[: base_layers_capacity(not self.render_pool.output.transparent)]
+
     async def gateway_healthy(self) -> bool:
         """Check whether or not the gateway proxy is ready and healthy."""
         if settings.gateway_url is None:
@@ -268,6 +348,7 @@ class BallsDexBot(commands.AutoShardedBot):
 
     async def setup_hook(self) -> None:
         await self.tree.set_translator(Translator())
+        self.render_pool.start()
         log.info("Starting up with %s shards...", self.shard_count)
         if settings.gateway_url is None:
             return
@@ -470,6 +551,9 @@ class BallsDexBot(commands.AutoShardedBot):
                     exc_info=error.original,
                 )
                 return
+            if isinstance(error.original, RenderPoolBusy):
+                await send(error.original.message)
+                return
             if isinstance(error.original, discord.InteractionResponded):
                 # most likely an interaction received twice (happens sometimes),
                 # or two instances are running on the same token.
@@ -0,0 +1,280 @@
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image, ImageDraw
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from ballsdex.core.image_generator.image_gen import (
+    SOURCES_PATH,
+    CardFormat,
+    CardTemplate,
+    asset_cache,
+    clear_base_layers,
+    clear_text_masks,
+    draw_stats,
+    get_base_layer,
+    render_card,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILES = {
+    "png": CardFormat("png"),
+    "webp": CardFormat("webp", 90),
+    "jpeg": CardFormat("jpeg", 90),
+    "webp 50%": CardFormat("webp", 90, 0.5),
+    "jpeg 50%": CardFormat("jpeg", 90, 0.5),
+}
+LONG_DESCRIPTION = (
+    "When this ball enters the battlefield, every allied ball with the same regime gains "
+    "a shield absorbing the next attack, and every opposing ball loses ten percent of its "
+    "current health each turn until the end of the fight or until it retreats completely."
+)
+
+
+# duck-typed stand-ins for Ball and BallInstance, only holding what the renderer reads
+@dataclass
+class SyntheticRegime:
+    background: str
+
+
+@dataclass
+class SyntheticEconomy:
+    icon: str
+
+
+@dataclass
+class SyntheticBall:
+    pk: int
+    country: str
+    short_name: str | None
+    capacity_name: str
+    capacity_description: str
+    credits: str
+    collection_card: str
+    cached_regime: SyntheticRegime
+    cached_economy: SyntheticEconomy | None
+
+
+@dataclass
+class SyntheticBallInstance:
+    countryball: SyntheticBall
+    health: int
+    attack: int
+    shiny: bool = False
+    special_card: str | None = None
+
+
+class Fixtures:
+    """
+    Generate backgrounds, artworks and balls in a temporary directory of the working
+    directory, since the renderer expects paths relative to it.
+    """
+
+    def __init__(self, directory: Path, balls: int):
+        self.directory = directory
+        self.rng = random.Random(0)
+        self.backgrounds = [self.generate_image(f"regime{i}", (1428, 2000)) for i in range(4)]
+        self.special = self.generate_image("special", (1428, 2000))
+        self.icon = self.generate_image("economy", (512, 512))
+        self.balls = [self.generate_ball(i) for i in range(balls)]
+
+    def generate_image(self, name: str, size: tuple[int, int]) -> str:
+        image = Image.new("RGBA", size, self.random_color())
+        draw = ImageDraw.Draw(image)
+        for _ in range(30):
+            x, y = self.rng.randrange(size[0]), self.rng.randrange(size[1])
+            radius = self.rng.randrange(20, size[0] // 3)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), self.random_color())
+        path = self.directory / f"{name}.png"
+        image.save(path)
+        # the renderer prefixes paths with a dot
+        return "/" + str(path.relative_to(Path.cwd()))
+
+    def random_color(self) -> tuple[int, int, int, int]:
+        return (self.rng.randrange(256), self.rng.randrange(256), self.rng.randrange(256), 255)
+
+    def generate_ball(self, pk: int, description: str | None = None) -> SyntheticBall:
+        return SyntheticBall(
+            pk=pk,
+            country=f"Ball {pk}",
+            short_name=None,
+            capacity_name=f"Ability number {pk}",
+            capacity_description=description or "Gains 20% attack when fighting allies.",
+            credits="Benchmark",
+            collection_card=self.generate_image(f"artwork{pk}", (1500, 750)),
+            cached_regime=SyntheticRegime(self.backgrounds[pk % len(self.backgrounds)]),
+            cached_economy=SyntheticEconomy(self.icon),
+        )
+
+    def instance(self, ball: SyntheticBall, **kwargs) -> SyntheticBallInstance:
+        return SyntheticBallInstance(
+            countryball=ball,
+            health=self.rng.randint(500, 2000),
+            attack=self.rng.randint(500, 2000),
+            **kwargs,
+        )
+
+
+def render(instance: SyntheticBallInstance, output: CardFormat) -> bytes:
+    template = CardTemplate.from_instance(instance)  # type: ignore
+    return render_card(template, instance.health, instance.attack, instance.shiny, output)
+
+
+def peak_rss() -> str:
+    if resource is None:
+        return "n/a"
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return f"{usage / (1024 * 1024 if sys.platform == 'darwin' else 1024):.0f}MiB"
+
+
+def bench_scenarios(fixtures: Fixtures, iterations: int, output: CardFormat) -> Table:
+    """
+    Measure the full rendering of cards (including encoding) in different situations.
+    """
+    long_ball = fixtures.generate_ball(len(fixtures.balls), LONG_DESCRIPTION)
+
+    def cold():
+        asset_cache.clear()
+        clear_base_layers()
+        clear_text_masks()
+        return fixtures.instance(fixtures.rng.choice(fixtures.balls))
+
+    def warm():
+        return fixtures.instance(fixtures.balls[0])
+
+    def shiny():
+        return fixtures.instance(fixtures.balls[0], shiny=True)
+
+    def special():
+        return fixtures.instance(fixtures.balls[0], special_card=fixtures.special)
+
+    def long_description():
+        # assets stay cached, but the text is laid out and drawn again each time
+        clear_base_layers()
+        clear_text_masks()
+        return fixtures.instance(long_ball)
+
+    scenarios: dict[str, Callable[[], SyntheticBallInstance]] = {
+        "Cold cache": cold,
+        "Warm cache": warm,
+        "Shiny": shiny,
+        "Special": special,
+        "Long description": long_description,
+    }
+
+    table = Table(box=box.SIMPLE, title=f"Card rendering ({output.format}, x{output.scale})")
+    table.add_column("Scenario", style="cyan")
+    table.add_column("p50", justify="right", style="green")
+    table.add_column("p99", justify="right")
+    table.add_column("Cards/s/core", justify="right", style="green")
+    table.add_column("Peak RSS", justify="right")
+    for name, setup in scenarios.items():
+        render(setup(), output)  # warmup, the cold scenario clears caches itself
+        times: list[float] = []
+        for _ in range(iterations):
+            instance = setup()
+            t1 = time.perf_counter()
+            render(instance, output)
+            times.append(time.perf_counter() - t1)
+        percentiles = statistics.quantiles(times, n=100, method="inclusive")
+        table.add_row(
+            name,
+            f"{statistics.median(times) * 1000:.1f}ms",
+            f"{percentiles[98] * 1000:.1f}ms",
+            f"{len(times) / sum(times):.1f}",
+            peak_rss(),
+        )
+    return table
+
+
+def sample_template() -> CardTemplate:
+    return CardTemplate(
+        ball_id=1,
+        title="France",
+        capacity_name="Liberté, égalité, fraternité",
+        capacity_description="Gains 20% attack when fighting alongside allies.",
+        credits="El Laggron",
+        background=str(SOURCES_PATH / "democracy.png"),
+        artwork=str(SOURCES_PATH / "fr_test.png"),
+        icon=str(SOURCES_PATH / "capitalist.png"),
+    )
+
+
+def bench_formats(iterations: int) -> Table:
+    """
+    Measure the encoding time and size of a card for each output profile.
+    """
+    image = get_base_layer(sample_template()).copy()
+    draw_stats(image, 1200, 550)
+
+    table = Table(box=box.SIMPLE, title="Card encoding")
+    table.add_column("Profile", style="cyan")
+    table.add_column("Median", justify="right", style="green")
+    table.add_column("Max", justify="right")
+    table.add_column("Size", justify="right", style="green")
+    for name, profile in PROFILES.items():
+        times: list[float] = []
+        for _ in range(iterations):
+            t1 = time.perf_counter()
+            data = profile.encode(image)
+            times.append(time.perf_counter() - t1)
+        table.add_row(
+            name,
+            f"{statistics.median(times) * 1000:.1f}ms",
+            f"{max(times) * 1000:.1f}ms",
+            f"{len(data) / 1024:.0f}KiB",
+        )
+    image.close()
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m ballsdex.core.image_generator.benchmark",
+        description="Measure the performance of card rendering",
+    )
+    parser.add_argument(
+        "--iterations", "-n", type=int, default=20, help="Number of runs of each measure"
+    )
+    parser.add_argument(
+        "--balls", type=int, default=10, help="Number of synthetic balls for the cold cache"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("png", "webp", "jpeg"),
+        default="png",
+        help="Output format used in the rendering scenarios",
+    )
+    parser.add_argument("--quality", type=int, default=90, help="Encoding quality")
+    parser.add_argument("--scale", type=float, default=1.0, help="Card size factor")
+    parser.add_argument(
+        "--skip-formats", action="store_true", help="Do not compare the output profiles"
+    )
+    args = parser.parse_args()
+
+    console = Console()
+    with tempfile.TemporaryDirectory(prefix=".benchmark-", dir=Path.cwd()) as directory:
+        with console.status("Generating fixtures..."):
+            fixtures = Fixtures(Path(directory), args.balls)
+        output = CardFormat(args.format, args.quality, args.scale)
+        console.print(bench_scenarios(fixtures, args.iterations, output))
+    if not args.skip_formats:
+        console.print(bench_formats(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
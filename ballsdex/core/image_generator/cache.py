@@ -0,0 +1,237 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from cachetools import LRUCache
+from PIL import Image, ImageOps
+
+
+class AssetCache:
+    """
+    Process-wide LRU cache of decoded card assets.
+
+    Entries are keyed by path, modification time and optional fitted size, so replacing a file
+    on disk is picked up on the next lookup. Returned images are shared between renders and
+    must never be modified in place, use `Image.copy` first if needed.
+
+    Attributes
+    ----------
+    max_bytes: int
+        Memory budget of the decoded pixels. Least recently used entries are evicted once this
+        is exceeded.
+    size: int
+        Current number of bytes held by the cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, int, tuple[int, int] | None], Image.Image] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, size: tuple[int, int] | None = None) -> Image.Image:
+        """
+        Return the RGBA image at the given path, decoding it if not cached.
+
+        Parameters
+        ----------
+        path: str
+            Path of the image on disk.
+        size: tuple[int, int] | None
+            If provided, the image is fitted (cropped and resized) to this size with
+            `ImageOps.fit` and only the fitted result is cached.
+
+        Returns
+        -------
+        Image.Image
+            The decoded image. Do not modify it.
+        """
+        key = (path, os.stat(path).st_mtime_ns, size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        # decoding is done outside of the lock, two threads may decode the same file at once
+        # but this is better than blocking all renders behind a single decode
+        with Image.open(path) as source:
+            image = source.convert("RGBA")
+        if size:
+            fitted = ImageOps.fit(image, size)
+            image.close()
+            image = fitted
+
+        nbytes = image.width * image.height * len(image.getbands())
+        if nbytes > self.max_bytes:
+            return image
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.width * evicted.height * len(evicted.getbands())
+        return image
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class CardCache:
+    """
+    LRU cache of encoded cards, keyed by a digest of everything visible on the card.
+
+    Cards are kept in memory up to a byte budget, and optionally also written to a directory
+    to survive restarts. Since the key is derived from the content, stale entries are never
+    served. Once the directory exceeds its budget, the least recently used cards are deleted.
+
+    Attributes
+    ----------
+    directory: Path | None
+        Directory where cards are also written, if enabled.
+    max_disk_bytes: int
+        Budget of the directory, 0 for no limit.
+    """
+
+    def __init__(self, max_bytes: int = 0, directory: Path | None = None, max_disk_bytes: int = 0):
+        self.directory: Path | None = None
+        self.max_disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: LRUCache[str, bytes]
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        # estimated size of the directory, unknown until it is scanned by `prune`
+        self._disk_size: int | None = None
+        self.configure(max_bytes, directory, max_disk_bytes)
+
+    def configure(self, max_bytes: int, directory: Path | None = None, max_disk_bytes: int = 0):
+        """
+        Set the memory budget, spill directory and its budget. This empties the memory cache.
+        """
+        with self._lock:
+            self._entries = LRUCache(max_bytes, getsizeof=len)
+            self.directory = directory
+            self.max_disk_bytes = max_disk_bytes
+            self._disk_size = None
+        if directory:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def clear(self):
+        """
+        Empty the memory cache. Cards in the directory stay, outdated ones are never looked up
+        again and are eventually pruned.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _path(self, key: str) -> Path:
+        assert self.directory
+        return self.directory / key[:2] / key
+
+    def get(self, key: str, *, memory_only: bool = False) -> bytes | None:
+        """
+        Return the encoded card for this key, or `None` if not cached.
+
+        Parameters
+        ----------
+        key: str
+            The card's digest.
+        memory_only: bool
+            Do not look into the spill directory. Use this on the event loop to avoid blocking
+            on disk reads.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+        if data is None and self.directory and not memory_only:
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                # the modification time orders the cards when pruning
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self._store(key, data)
+        if data is None:
+            if not memory_only:
+                self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def _store(self, key: str, data: bytes):
+        with self._lock:
+            try:
+                self._entries[key] = data
+            except ValueError:  # larger than the whole budget
+                pass
+
+    def set(self, key: str, data: bytes):
+        """
+        Cache an encoded card, writing it to the spill directory if enabled.
+        """
+        self._store(key, data)
+        if self.directory:
+            path = self._path(key)
+            path.parent.mkdir(exist_ok=True)
+            # write then rename, readers never see a partial file
+            temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            temp.write_bytes(data)
+            temp.replace(path)
+            with self._lock:
+                if self._disk_size is not None:
+                    self._disk_size += len(data)
+                full = self._disk_size is None or self._disk_size > self.max_disk_bytes
+            if self.max_disk_bytes and full:
+                self.prune()
+
+    def prune(self):
+        """
+        Delete the least recently used cards of the directory until it is back under 90% of
+        its budget. This scans the whole directory, only call it outside of the event loop.
+        """
+        if not self.directory or not self.max_disk_bytes:
+            return
+        if not self._prune_lock.acquire(blocking=False):
+            return  # another thread is already pruning
+        try:
+            files: list[tuple[int, int, Path]] = []
+            total = 0
+            for path in self.directory.glob("*/*"):
+                if path.suffix == ".tmp":
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+            if total > self.max_disk_bytes:
+                files.sort()
+                target = self.max_disk_bytes * 0.9
+                for _, size, path in files:
+                    if total <= target:
+                        break
+                    path.unlink(missing_ok=True)
+                    total -= size
+            with self._lock:
+                self._disk_size = total
+        finally:
+            self._prune_lock.release()
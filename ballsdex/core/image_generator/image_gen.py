@@ -1,12 +1,20 @@
+import functools
+import hashlib
 import os
 import textwrap
+import threading
+from dataclasses import dataclass
+from io import BytesIO
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple
 
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from cachetools import LRUCache
+from PIL import Image, ImageDraw, ImageFont
+
+from ballsdex.core.image_generator.cache import AssetCache, CardCache
 
 if TYPE_CHECKING:
-    from ballsdex.core.models import BallInstance
+    from ballsdex.core.models import Ball, BallInstance
 
 
 SOURCES_PATH = Path(os.path.dirname(os.path.abspath(__file__)), "./src")
@@ -17,7 +25,7 @@ RECTANGLE_WIDTH = WIDTH - 40
 RECTANGLE_HEIGHT = (HEIGHT // 5) * 2
 
 CORNERS = ((34, 261), (1393, 992))
-artwork_size = [b - a for a, b in zip(*CORNERS)]
+artwork_size = (CORNERS[1][0] - CORNERS[0][0], CORNERS[1][1] - CORNERS[0][1])
 
 title_font = ImageFont.truetype(str(SOURCES_PATH / "ArsenicaTrial-Extrabold.ttf"), 170)
 capacity_name_font = ImageFont.truetype(str(SOURCES_PATH / "Bobby Jones Soft.otf"), 110)
@@ -26,82 +34,482 @@ stats_font = ImageFont.truetype(str(SOURCES_PATH / "Bobby Jones Soft.otf"), 130)
 credits_font = ImageFont.truetype(str(SOURCES_PATH / "arial.ttf"), 40)
 
 
-def draw_card(ball_instance: "BallInstance"):
-    ball = ball_instance.countryball
-    ball_health = (237, 115, 101, 255)
-
-    if ball_instance.shiny:
-        image = Image.open(str(SOURCES_PATH / "shiny.png"))
-        ball_health = (255, 255, 255, 255)
-    elif special_image := ball_instance.special_card:
-        image = Image.open("." + special_image)
-    else:
-        image = Image.open("." + ball.cached_regime.background)
-    image = image.convert("RGBA")
-    icon = (
-        Image.open("." + ball.cached_economy.icon).convert("RGBA") if ball.cached_economy else None
+@dataclass(frozen=True)
+class CacheSizes:
+    """
+    Memory budgets of the caches kept by each rendering process, in bytes.
+
+    Attributes
+    ----------
+    assets: int
+        Decoded backgrounds, fitted artworks and icons, see `AssetCache`.
+    base_layers: int
+        Pre-rendered cards without the stats, see `get_base_layer`.
+    texts: int
+        Rasterized texts, see `get_text_masks`.
+    """
+
+    assets: int = 256 * 1024 * 1024
+    base_layers: int = 384 * 1024 * 1024
+    texts: int = 64 * 1024 * 1024
+
+    def split(self, parts: int) -> "CacheSizes":
+        """
+        Divide the budgets between the given number of processes.
+        """
+        parts = max(parts, 1)
+        return CacheSizes(self.assets // parts, self.base_layers // parts, self.texts // parts)
+
+
+def new_base_layers(max_bytes: int) -> LRUCache[tuple["CardTemplate", bool], Image.Image]:
+    return LRUCache(
+        max_bytes, getsizeof=lambda image: image.width * image.height * len(image.getbands())
     )
 
-    draw = ImageDraw.Draw(image)
-    draw.text(
-        (50, 20),
-        ball.short_name or ball.country,
-        font=title_font,
-        stroke_width=2,
-        stroke_fill=(0, 0, 0, 255),
+
+def new_text_masks(max_bytes: int) -> LRUCache[tuple, "TextMasks"]:
+    return LRUCache(
+        max_bytes,
+        getsizeof=lambda masks: masks.fill.width * masks.fill.height * (2 if masks.stroke else 1),
     )
-    for i, line in enumerate(textwrap.wrap(f"Ability: {ball.capacity_name}", width=26)):
-        draw.text(
+
+
+# caches shared by all renders of this process, resized by `configure_caches`
+asset_cache = AssetCache(CacheSizes.assets)
+base_layers = new_base_layers(CacheSizes.base_layers)
+base_layers_lock = threading.Lock()
+text_masks = new_text_masks(CacheSizes.texts)
+text_masks_lock = threading.Lock()
+
+# encoded cards, configured by the bot with the values from the settings
+# bump the version when the card layout changes to invalidate the cards saved on disk
+CARD_CACHE_VERSION = 1
+card_cache = CardCache(128 * 1024 * 1024)
+
+
+@dataclass(frozen=True)
+class CardFormat:
+    """
+    Output profile of rendered cards.
+
+    Attributes
+    ----------
+    format: str
+        One of "png", "webp" or "jpeg". JPEG does not support transparency.
+    quality: int
+        Encoding quality between 1 and 100, ignored for PNG.
+    scale: float
+        Factor applied to the card's size, between 0 and 1.
+    """
+
+    format: str = "png"
+    quality: int = 90
+    scale: float = 1.0
+
+    def __post_init__(self):
+        if self.format not in ("png", "webp", "jpeg"):
+            raise ValueError(f'Card format must be "png", "webp" or "jpeg", not "{self.format}"')
+        if not 0 < self.scale <= 1:
+            raise ValueError(f"Card scale must be between 0 and 1, not {self.scale}")
+
+    @property
+    def transparent(self) -> bool:
+        return self.format != "jpeg"
+
+    @property
+    def extension(self) -> str:
+        return "jpg" if self.format == "jpeg" else self.format
+
+    def encode(self, image: Image.Image) -> bytes:
+        if self.scale != 1:
+            size = (round(image.width * self.scale), round(image.height * self.scale))
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        buffer = BytesIO()
+        if self.format == "jpeg":
+            image.convert("RGB").save(buffer, format="jpeg", quality=self.quality)
+        elif self.format == "webp":
+            # higher methods are twice as slow for a few percent of size
+            image.save(buffer, format="webp", quality=self.quality, method=2)
+        else:
+            image.save(buffer, format="png")
+        return buffer.getvalue()
+
+
+# full size PNG, used for exports from the admin panel
+LOSSLESS = CardFormat()
+
+
+class AssetStamp(NamedTuple):
+    """
+    Version of an asset file, changing when the file is replaced.
+    """
+
+    mtime_ns: int
+    size: int
+
+
+# versions of the asset files, read once per path until the cache is reloaded
+asset_stamps: dict[str, AssetStamp | None] = {}
+
+
+def asset_stamp(path: str | None) -> AssetStamp | None:
+    """
+    Return the modification time and size of an asset, or `None` if it does not exist.
+
+    The file is only read the first time, until `clear_asset_stamps` is called.
+    """
+    if path is None:
+        return None
+    try:
+        return asset_stamps[path]
+    except KeyError:
+        pass
+    try:
+        stat = os.stat(path)
+    except OSError:
+        stamp = None
+    else:
+        stamp = AssetStamp(stat.st_mtime_ns, stat.st_size)
+    asset_stamps[path] = stamp
+    return stamp
+
+
+def clear_asset_stamps():
+    """
+    Forget the versions of the asset files. Called when the balls are reloaded.
+    """
+    asset_stamps.clear()
+
+
+@dataclass(frozen=True)
+class CardTemplate:
+    """
+    Everything drawn on a card that only depends on the `Ball` and the chosen background.
+
+    This is hashable and used as the key of the base layer and card caches, any change to the
+    ball's visible fields or to the files of its assets results in a different key.
+
+    Attributes
+    ----------
+    ball_id: int | None
+        ID of the ball, `None` for temporary balls which are never cached.
+    title: str
+        Name displayed at the top of the card.
+    capacity_name: str
+        Name of the ball's ability.
+    capacity_description: str
+        Description of the ball's ability.
+    credits: str
+        Author of the artwork.
+    background: str
+        Path to the background image (regime, shiny or special).
+    artwork: str
+        Path to the collection artwork.
+    icon: str | None
+        Path to the economy icon, if any.
+    stamps: tuple[AssetStamp | None, ...]
+        Modification time and size of the background, artwork and icon files, so that
+        replacing an asset at the same path changes the key once the cache is reloaded.
+    """
+
+    ball_id: int | None
+    title: str
+    capacity_name: str
+    capacity_description: str
+    credits: str
+    background: str
+    artwork: str
+    icon: str | None
+    stamps: tuple["AssetStamp | None", ...] = ()
+
+    @classmethod
+    def from_instance(cls, ball_instance: "BallInstance") -> "CardTemplate":
+        ball = ball_instance.countryball
+        if ball_instance.shiny:
+            background = str(SOURCES_PATH / "shiny.png")
+        elif special_image := ball_instance.special_card:
+            background = "." + special_image
+        else:
+            background = "." + ball.cached_regime.background
+        return cls.from_ball(ball, background)
+
+    @classmethod
+    def from_ball(cls, ball: "Ball", background: str) -> "CardTemplate":
+        artwork = "." + ball.collection_card
+        icon = "." + ball.cached_economy.icon if ball.cached_economy else None
+        return cls(
+            ball_id=getattr(ball, "pk", None),
+            title=ball.short_name or ball.country,
+            capacity_name=ball.capacity_name,
+            capacity_description=ball.capacity_description,
+            credits=ball.credits,
+            background=background,
+            artwork=artwork,
+            icon=icon,
+            stamps=(asset_stamp(background), asset_stamp(artwork), asset_stamp(icon)),
+        )
+
+
+class TextMasks(NamedTuple):
+    """
+    Pre-rasterized text, pasted with a color instead of drawing it again with FreeType.
+
+    Attributes
+    ----------
+    offset: tuple[int, int]
+        Position of the masks relative to the text's anchor point.
+    stroke: Image.Image | None
+        Mask of the stroked text, if any.
+    fill: Image.Image
+        Mask of the text itself.
+    """
+
+    offset: tuple[int, int]
+    stroke: Image.Image | None
+    fill: Image.Image
+
+
+def render_text_masks(
+    text: str, font: ImageFont.FreeTypeFont, stroke_width: int = 0, anchor: str | None = None
+) -> TextMasks:
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox(
+        (0, 0), text, font=font, stroke_width=stroke_width, anchor=anchor
+    )
+    size = (right - left, bottom - top)
+    origin = (-left, -top)
+    stroke = None
+    if stroke_width:
+        stroke = Image.new("L", size)
+        ImageDraw.Draw(stroke).text(
+            origin,
+            text,
+            font=font,
+            fill=255,
+            stroke_width=stroke_width,
+            stroke_fill=255,
+            anchor=anchor,
+        )
+    fill = Image.new("L", size)
+    ImageDraw.Draw(fill).text(origin, text, font=font, fill=255, anchor=anchor)
+    return TextMasks((left, top), stroke, fill)
+
+
+def get_text_masks(
+    text: str, font: ImageFont.FreeTypeFont, stroke_width: int = 0, anchor: str | None = None
+) -> TextMasks:
+    """
+    Return the masks of a text from the cache, rendering them if needed.
+    """
+    key = (text, font, stroke_width, anchor)
+    with text_masks_lock:
+        masks = text_masks.get(key)
+    if masks is None:
+        masks = render_text_masks(text, font, stroke_width, anchor)
+        with text_masks_lock:
+            text_masks[key] = masks
+    return masks
+
+
+def draw_text(
+    image: Image.Image,
+    xy: tuple[int, int],
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    fill: tuple[int, int, int, int] = (255, 255, 255, 255),
+    stroke_width: int = 0,
+    stroke_fill: tuple[int, int, int, int] = (0, 0, 0, 255),
+    anchor: str | None = None,
+):
+    """
+    Same result as `ImageDraw.text`, but using the cached masks of the text.
+    """
+    masks = get_text_masks(text, font, stroke_width, anchor)
+    position = (xy[0] + masks.offset[0], xy[1] + masks.offset[1])
+    if masks.stroke:
+        image.paste(stroke_fill, position, mask=masks.stroke)
+    image.paste(fill, position, mask=masks.fill)
+
+
+@functools.lru_cache(maxsize=4096)
+def wrap_text(text: str, width: int) -> tuple[str, ...]:
+    return tuple(textwrap.wrap(text, width=width))
+
+
+def draw_base_layer(template: CardTemplate) -> Image.Image:
+    """
+    Draw the static part of a card: background, texts, artwork and icon, without the stats.
+    """
+    # cached images are shared, always work on a copy
+    image = asset_cache.get(template.background).copy()
+
+    draw_text(image, (50, 20), template.title, title_font, stroke_width=2)
+    for i, line in enumerate(wrap_text(f"Ability: {template.capacity_name}", 26)):
+        draw_text(
+            image,
             (100, 1050 + 100 * i),
             line,
-            font=capacity_name_font,
+            capacity_name_font,
             fill=(230, 230, 230, 255),
             stroke_width=2,
-            stroke_fill=(0, 0, 0, 255),
         )
-    for i, line in enumerate(textwrap.wrap(ball.capacity_description, width=32)):
-        draw.text(
-            (60, 1300 + 80 * i),
-            line,
-            font=capacity_description_font,
-            stroke_width=1,
-            stroke_fill=(0, 0, 0, 255),
-        )
-    draw.text(
+    for i, line in enumerate(wrap_text(template.capacity_description, 32)):
+        draw_text(image, (60, 1300 + 80 * i), line, capacity_description_font, stroke_width=1)
+    draw_text(
+        image,
+        (30, 1870),
+        # Modifying the line below is breaking the licence as you are removing credits
+        # If you don't want to receive a DMCA, just don't
+        "Created by El Laggron\n" f"Artwork author: {template.credits}",
+        credits_font,
+        fill=(0, 0, 0, 255),
+    )
+
+    artwork = asset_cache.get(template.artwork, artwork_size)
+    image.paste(artwork, CORNERS[0])
+
+    if template.icon:
+        icon = asset_cache.get(template.icon, (192, 192))
+        image.paste(icon, (1200, 30), mask=icon)
+
+    return image
+
+
+def get_base_layer(template: CardTemplate, flatten: bool = False) -> Image.Image:
+    """
+    Return the base layer of a card from the cache, drawing it if needed.
+
+    With `flatten`, the transparency is dropped for outputs not supporting it, which gives an
+    RGB image using three quarters of the memory. The stats drawn on it are identical.
+
+    The returned image is shared and must not be modified, use `Image.copy` first.
+    """
+    if template.ball_id is None:
+        image = draw_base_layer(template)
+        return image.convert("RGB") if flatten else image
+    key = (template, flatten)
+    with base_layers_lock:
+        image = base_layers.get(key)
+    if image is None:
+        image = draw_base_layer(template)
+        if flatten:
+            image = image.convert("RGB")
+        with base_layers_lock:
+            base_layers[key] = image
+    return image
+
+
+def prepare_base_layer(template: CardTemplate, flatten: bool = False):
+    """
+    Draw a base layer in the cache of the current process, without returning it.
+    """
+    get_base_layer(template, flatten)
+
+
+def base_layers_capacity(flatten: bool = False) -> int:
+    """
+    Approximate number of base layers fitting in the cache.
+    """
+    return int(base_layers.maxsize) // (WIDTH * HEIGHT * (3 if flatten else 4))
+
+
+def clear_base_layers():
+    """
+    Drop all cached base layers. Called when the balls are reloaded.
+    """
+    with base_layers_lock:
+        base_layers.clear()
+
+
+def clear_text_masks():
+    """
+    Drop all rasterized texts.
+    """
+    with text_masks_lock:
+        text_masks.clear()
+    wrap_text.cache_clear()
+
+
+def configure_caches(sizes: CacheSizes):
+    """
+    Set the memory budgets of the caches of the current process, emptying them.
+
+    This is also the initializer of the render pool's worker processes.
+    """
+    global base_layers, text_masks
+    asset_cache.max_bytes = sizes.assets
+    asset_cache.clear()
+    with base_layers_lock:
+        base_layers = new_base_layers(sizes.base_layers)
+    with text_masks_lock:
+        text_masks = new_text_masks(sizes.texts)
+    wrap_text.cache_clear()
+
+
+def draw_stats(image: Image.Image, health: int, attack: int, shiny: bool = False):
+    """
+    Draw the health and attack values on a card, in place.
+    """
+    draw_text(
+        image,
         (320, 1670),
-        str(ball_instance.health),
-        font=stats_font,
-        fill=ball_health,
+        str(health),
+        stats_font,
+        fill=(255, 255, 255, 255) if shiny else (237, 115, 101, 255),
         stroke_width=1,
-        stroke_fill=(0, 0, 0, 255),
     )
-    draw.text(
+    draw_text(
+        image,
         (1120, 1670),
-        str(ball_instance.attack),
-        font=stats_font,
+        str(attack),
+        stats_font,
         fill=(252, 194, 76, 255),
         stroke_width=1,
-        stroke_fill=(0, 0, 0, 255),
         anchor="ra",
     )
-    draw.text(
-        (30, 1870),
-        # Modifying the line below is breaking the licence as you are removing credits
-        # If you don't want to receive a DMCA, just don't
-        "Created by El Laggron\n" f"Artwork author: {ball.credits}",
-        font=credits_font,
-        fill=(0, 0, 0, 255),
-        stroke_width=0,
-        stroke_fill=(255, 255, 255, 255),
-    )
 
-    artwork = Image.open("." + ball.collection_card).convert("RGBA")
-    image.paste(ImageOps.fit(artwork, artwork_size), CORNERS[0])  # type: ignore
-
-    if icon:
-        icon = ImageOps.fit(icon, (192, 192))
-        image.paste(icon, (1200, 30), mask=icon)
-        icon.close()
-    artwork.close()
 
+def draw_card(ball_instance: "BallInstance"):
+    template = CardTemplate.from_instance(ball_instance)
+    image = get_base_layer(template).copy()
+    draw_stats(image, ball_instance.health, ball_instance.attack, ball_instance.shiny)
     return image
+
+
+def render_card(
+    template: CardTemplate,
+    health: int,
+    attack: int,
+    shiny: bool,
+    output: CardFormat = LOSSLESS,
+) -> bytes:
+    """
+    Render and encode a card. This only takes picklable arguments to be usable in a
+    process pool.
+    """
+    image = get_base_layer(template, flatten=not output.transparent).copy()
+    draw_stats(image, health, attack, shiny)
+    data = output.encode(image)
+    image.close()
+    return data
+
+
+def card_cache_key(
+    ball_instance: "BallInstance",
+    output: CardFormat = LOSSLESS,
+    template: CardTemplate | None = None,
+) -> str:
+    """
+    Return a digest of everything visible on the card of this instance, including the versions
+    of its asset files, used as the key of `card_cache`.
+
+    Pass the instance's template if already built, to avoid building it again.
+    """
+    state = (
+        CARD_CACHE_VERSION,
+        template or CardTemplate.from_instance(ball_instance),
+        ball_instance.health,
+        ball_instance.attack,
+        ball_instance.shiny,
+        output,
+    )
+    return hashlib.sha1(repr(state).encode()).hexdigest()
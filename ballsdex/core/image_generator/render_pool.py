@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+from prometheus_client import Gauge, Histogram
+
+from ballsdex.core.image_generator.image_gen import (
+    LOSSLESS,
+    CacheSizes,
+    CardFormat,
+    CardTemplate,
+    card_cache,
+    card_cache_key,
+    configure_caches,
+    prepare_base_layer,
+    render_card,
+)
+
+if TYPE_CHECKING:
+    from ballsdex.core.models import BallInstance
+
+log = logging.getLogger("ballsdex.core.image_generator.render_pool")
+render_queue = Gauge("card_render_queue", "Cards being rendered or waiting for a worker")
+render_time = Histogram(
+    "card_render_time",
+    "Time spent rendering and encoding a card, including the wait for a worker",
+    ["pool"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, float("inf")),
+)
+warmup_done = Gauge("card_warmup_done", "Base layers pre-rendered by the current or last warmup")
+warmup_total = Gauge(
+    "card_warmup_total", "Base layers to pre-render in the current or last warmup"
+)
+
+
+class RenderPoolBusy(Exception):
+    """
+    Raised when too many cards are already waiting to be rendered.
+
+    Attributes
+    ----------
+    message: str
+        Message shown to the user by the error handlers.
+    """
+
+    message = (
+        "The bot is rendering too many cards at the moment, please try again in a few seconds."
+    )
+
+    def __init__(self):
+        super().__init__(self.message)
+
+
+class RenderPool:
+    """
+    Long-lived pool of workers rendering cards outside of the event loop.
+
+    With processes, each worker keeps its own asset, base layer and text caches, sharing the
+    configured memory budgets between them. These caches are not
+    cleared by `load_cache`. Their keys include the ball's fields and the modification time
+    and size of its asset files, so edited balls and replaced assets get new entries, while
+    the outdated ones stay until evicted by more recent cards.
+
+    Attributes
+    ----------
+    kind: str
+        Either "thread" or "process".
+    workers: int | None
+        Number of workers, defaults to the number of CPUs.
+    max_queue: int
+        Maximum number of cards being rendered or waiting at once. Further requests raise
+        `RenderPoolBusy`.
+    output: CardFormat
+        Format of the rendered cards.
+    cache_sizes: CacheSizes
+        Memory budgets of the asset, base layer and text caches. With processes, they are
+        divided between the workers and the bot's process.
+    pending: int
+        Number of cards currently being rendered or waiting.
+    warmup_done: int
+        Number of base layers pre-rendered by the current or last warmup.
+    warmup_total: int
+        Number of base layers to pre-render in the current or last warmup.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        workers: int | None = None,
+        max_queue: int = 50,
+        output: CardFormat = LOSSLESS,
+        cache_sizes: CacheSizes = CacheSizes(),
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f'Render pool type must be "thread" or "process", not "{kind}"')
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.output = output
+        self.cache_sizes = cache_sizes
+        self.pending = 0
+        self.executor: Executor | None = None
+        self.warmup_done = 0
+        self.warmup_total = 0
+        self.warmup_task: asyncio.Task | None = None
+
+    def start(self):
+        if self.executor is not None:
+            return
+        if self.kind == "process":
+            # a few commands still draw cards in the bot's process, counted as one more worker
+            sizes = self.cache_sizes.split((self.workers or os.cpu_count() or 1) + 1)
+            configure_caches(sizes)
+            # forking a process running an event loop and threads is unsafe
+            self.executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_caches,
+                initargs=(sizes,),
+            )
+        else:
+            configure_caches(self.cache_sizes)
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="card-render")
+        log.info(f"Started card render pool with {self.kind} workers.")
+
+    def shutdown(self):
+        if self.warmup_task:
+            self.warmup_task.cancel()
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        log.info("Card render pool stopped.")
+
+    async def render(self, ball_instance: "BallInstance") -> bytes:
+        """
+        Return the encoded card of this instance, from the cache or rendered by a worker.
+
+        Raises
+        ------
+        RenderPoolBusy
+            Too many cards are waiting to be rendered, the user should try again later.
+        """
+        template = CardTemplate.from_instance(ball_instance)
+        key = card_cache_key(ball_instance, self.output, template)
+        if data := card_cache.get(key, memory_only=True):
+            return data
+
+        if self.pending >= self.max_queue:
+            raise RenderPoolBusy()
+        if self.executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+
+        self.pending += 1
+        render_queue.inc()
+        try:
+            if card_cache.directory:
+                # disk lookups are done on the default executor, not to block the loop
+                if data := await loop.run_in_executor(None, card_cache.get, key):
+                    return data
+            t1 = time.perf_counter()
+            data = await loop.run_in_executor(
+                self.executor,
+                render_card,
+                template,
+                ball_instance.health,
+                ball_instance.attack,
+                ball_instance.shiny,
+                self.output,
+            )
+            render_time.labels(pool=self.kind).observe(time.perf_counter() - t1)
+        finally:
+            self.pending -= 1
+            render_queue.dec()
+
+        if card_cache.directory:
+            await loop.run_in_executor(None, card_cache.set, key, data)
+        else:
+            card_cache.set(key, data)
+        return data
+
+    async def warmup(self, templates: list[CardTemplate], delay: float = 0.1):
+        """
+        Pre-render the base layers of the given cards, one at a time, pausing whenever actual
+        cards are waiting to be rendered.
+
+        Progress is exposed with the `card_warmup_done` and `card_warmup_total` metrics.
+        """
+        if self.executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        self.warmup_done = 0
+        self.warmup_total = len(templates)
+        warmup_done.set(0)
+        warmup_total.set(len(templates))
+        t1 = time.perf_counter()
+        for template in templates:
+            while self.pending:
+                await asyncio.sleep(delay)
+            try:
+                await loop.run_in_executor(
+                    self.executor, prepare_base_layer, template, not self.output.transparent
+                )
+            except Exception:
+                log.warning(f"Failed to pre-render card of ball {template.ball_id}", exc_info=True)
+            self.warmup_done += 1
+            warmup_done.inc()
+            await asyncio.sleep(delay)
+        log.info(f"Pre-rendered {self.warmup_done} cards in {round(time.perf_counter() - t1)}s.")
+
+    def start_warmup(self, get_templates: Callable[[], list[CardTemplate]]) -> bool:
+        """
+        Start `warmup` in the background, cancelling the previous one if still running.
+
+        The cards are listed by calling `get_templates` in a thread, as building templates reads
+        the asset files.
+
+        Base layers are cached by the process drawing them, and a process pool gives no control
+        over which worker runs a task, so warmup is only done with threads. Returns whether it
+        was started.
+        """
+        if self.warmup_task:
+            self.warmup_task.cancel()
+        if self.kind == "process":
+            log.warning("Card warmup is only supported with thread workers, skipping.")
+            return False
+
+        async def list_and_warmup():
+            await self.warmup(await asyncio.to_thread(get_templates))
+
+        self.warmup_task = asyncio.create_task(list_and_warmup())
+        return True
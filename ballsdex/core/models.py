@@ -1,18 +1,32 @@
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from collections import namedtuple
 from datetime import datetime, timedelta
 from enum import IntEnum
 from io import BytesIO
-from typing import TYPE_CHECKING, Iterable, Tuple, Type
+from typing import TYPE_CHECKING, Any, Iterable, Tuple, Type
 
 import discord
+from cachetools import LRUCache, TTLCache
 from discord.utils import format_dt
 from fastapi_admin.models import AbstractAdmin
+from prometheus_client import Counter
 from tortoise import exceptions, fields, models, signals, timezone, validators
 from tortoise.expressions import Q
-
-from ballsdex.core.image_generator.image_gen import draw_card
+from tortoise.transactions import in_transaction
+
+from ballsdex.core.image_generator.image_gen import (
+    LOSSLESS,
+    CardFormat,
+    CardTemplate,
+    card_cache,
+    card_cache_key,
+    render_card,
+)
+from ballsdex.core.utils.catch_names import CatchNameIndex
+from ballsdex.core.utils.sampler import WeightedSampler
+from ballsdex.core.utils.special_schedule import SpecialSchedule
 
 if TYPE_CHECKING:
     from tortoise.backends.base.client import BaseDBAsyncClient
@@ -23,6 +37,13 @@ regimes: dict[int, Regime] = {}
 economies: dict[int, Economy] = {}
 specials: dict[int, Special] = {}
 
+# enabled balls weighted by rarity, rebuilt with the cache
+ball_sampler: WeightedSampler[Ball] = WeightedSampler()
+# normalized names accepted to catch each ball, rebuilt with the cache
+catch_names = CatchNameIndex()
+# specials running at any given time with their weights, rebuilt with the cache
+special_schedule = SpecialSchedule()
+
 
 async def lower_catch_names(
     model: Type[Ball],
@@ -82,6 +103,75 @@ class GuildConfig(models.Model):
     )
 
 
+guild_config_lookups = Counter(
+    "guild_config_cache_lookups", "Lookups of guild configs in the memory cache", ["result"]
+)
+
+
+class GuildConfigCache:
+    """
+    Bounded in-process cache of the guild configs, kept up to date by the commands editing them.
+
+    Configs are shared objects: after modifying and saving one, call `set` so that the cache
+    holds the saved version. Changes made outside of the bot (admin panel) are only seen after
+    `clear`, which is called when the cache is reloaded.
+
+    Attributes
+    ----------
+    maxsize: int
+        Maximum number of configs kept, least recently used ones are evicted first.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._configs: LRUCache[int, GuildConfig] = LRUCache(maxsize)
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    async def get(self, guild_id: int) -> GuildConfig | None:
+        """
+        Return the config of a guild, or `None` if it was never configured.
+        """
+        if config := self._configs.get(guild_id):
+            guild_config_lookups.labels(result="hit").inc()
+            return config
+        guild_config_lookups.labels(result="miss").inc()
+        config = await GuildConfig.get_or_none(guild_id=guild_id)
+        if config:
+            self._configs[guild_id] = config
+        return config
+
+    async def get_or_create(self, guild_id: int) -> GuildConfig:
+        """
+        Return the config of a guild, creating a default one if needed.
+        """
+        if config := await self.get(guild_id):
+            return config
+        config, _ = await GuildConfig.get_or_create(guild_id=guild_id)
+        self._configs[guild_id] = config
+        return config
+
+    def set(self, config: GuildConfig):
+        """
+        Store a config that was just saved.
+        """
+        self._configs[config.guild_id] = config
+
+    def invalidate(self, guild_id: int):
+        """
+        Drop the config of a guild, it will be fetched again on the next access.
+        """
+        self._configs.pop(guild_id, None)
+
+    def clear(self):
+        self._configs.clear()
+
+
+GUILD_CONFIG_CACHE_SIZE = 50_000
+guild_configs = GuildConfigCache(GUILD_CONFIG_CACHE_SIZE)
+
+
 class Regime(models.Model):
     name = fields.CharField(max_length=64)
     background = fields.CharField(max_length=200, description="1428x2000 PNG image")
@@ -225,6 +315,53 @@ class BallInstance(models.Model):
 
     class Meta:
         unique_together = ("player", "id")
+        # the trigram index on to_hex("id") used by the autocompletion is only in migrations
+        indexes = (("player", "ball"),)
+
+    @classmethod
+    async def catch(
+        cls,
+        discord_id: int,
+        ball: Ball,
+        *,
+        shiny: bool = False,
+        special: Special | None = None,
+        attack_bonus: int = 0,
+        health_bonus: int = 0,
+        server_id: int | None = None,
+        spawned_time: datetime | None = None,
+    ) -> tuple[BallInstance, Player, bool]:
+        """
+        Give a new instance of a ball to a user, creating their player if needed.
+
+        Parameters
+        ----------
+        discord_id: int
+            Discord ID of the user catching the ball.
+        ball: Ball
+            The ball caught.
+
+        Returns
+        -------
+        tuple[BallInstance, Player, bool]
+            The created instance, the player owning it, and whether this is the first instance
+            of this ball owned by the player.
+        """
+        # created before the transaction, the cached player must never be rolled back
+        player = await players.get_or_create(discord_id)
+        async with in_transaction():
+            is_new = not await cls.filter(player=player, ball=ball).exists()
+            instance = await cls.create(
+                ball=ball,
+                player=player,
+                shiny=shiny,
+                special=special,
+                attack_bonus=attack_bonus,
+                health_bonus=health_bonus,
+                server_id=server_id,
+                spawned_time=spawned_time,
+            )
+        return instance, player, is_new
 
     @property
     def is_tradeable(self) -> bool:
@@ -317,13 +454,13 @@ class BallInstance(models.Model):
                     text = f"{emoji} {text}"
         return text
 
-    def draw_card(self) -> BytesIO:
-        image = draw_card(self)
-        buffer = BytesIO()
-        image.save(buffer, format="png")
-        buffer.seek(0)
-        image.close()
-        return buffer
+    def draw_card(self, output: CardFormat = LOSSLESS) -> BytesIO:
+        template = CardTemplate.from_instance(self)
+        key = card_cache_key(self, output, template)
+        if (data := card_cache.get(key)) is None:
+            data = render_card(template, self.health, self.attack, self.shiny, output)
+            card_cache.set(key, data)
+        return BytesIO(data)
 
     async def prepare_for_message(
         self, interaction: discord.Interaction
@@ -363,11 +500,11 @@ class BallInstance(models.Model):
             f"HP: {self.health} ({self.health_bonus:+d}%)"
         )
 
-        # draw image
-        with ThreadPoolExecutor() as pool:
-            buffer = await interaction.client.loop.run_in_executor(pool, self.draw_card)
+        # draw image, may raise RenderPoolBusy
+        render_pool = interaction.client.render_pool  # type: ignore
+        data = await render_pool.render(self)
 
-        return content, discord.File(buffer, "card.png")
+        return content, discord.File(BytesIO(data), f"card.{render_pool.output.extension}")
 
     async def lock_for_trade(self):
         self.locked = timezone.now()
@@ -440,6 +577,266 @@ class Player(models.Model):
         return self.mention_policy == MentionPolicy.ALLOW
 
 
+player_lookups = Counter(
+    "player_cache_lookups", "Lookups of players in the memory cache", ["result"]
+)
+
+
+class PlayerCache:
+    """
+    Short-lived in-process cache of the players, so that an interaction fetching the same
+    player multiple times only queries the database once.
+
+    Players are shared between concurrent interactions and must not be modified in place,
+    change their fields with `update`, and call `invalidate` after deleting one. Changes made
+    outside of the bot (admin panel) are seen once the entry expires.
+
+    Attributes
+    ----------
+    maxsize: int
+        Maximum number of players kept, least recently used ones are evicted first.
+    ttl: float
+        Number of seconds a player is kept before being fetched again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._players: TTLCache[int, Player] = TTLCache(maxsize, ttl)
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    async def get(self, discord_id: int) -> Player | None:
+        """
+        Return the player with this Discord ID, or `None` if it does not exist.
+        """
+        if player := self._players.get(discord_id):
+            player_lookups.labels(result="hit").inc()
+            return player
+        player_lookups.labels(result="miss").inc()
+        player = await Player.get_or_none(discord_id=discord_id)
+        if player:
+            self._players[discord_id] = player
+        return player
+
+    async def fetch(self, discord_id: int) -> Player:
+        """
+        Return the player with this Discord ID.
+
+        Raises
+        ------
+        DoesNotExist
+            The player does not exist.
+        """
+        if player := await self.get(discord_id):
+            return player
+        raise exceptions.DoesNotExist("Object does not exist")
+
+    async def get_or_create(self, discord_id: int) -> Player:
+        """
+        Return the player with this Discord ID, creating it if needed.
+        """
+        if player := await self.get(discord_id):
+            return player
+        player, _ = await Player.get_or_create(discord_id=discord_id)
+        self._players[discord_id] = player
+        return player
+
+    def set(self, player: Player):
+        """
+        Store a player that was just saved.
+        """
+        self._players[player.discord_id] = player
+
+    async def update(self, player: Player, **fields: Any):
+        """
+        Save new values for some fields of a player, then apply them to the cached player.
+
+        The shared object is only modified once the database accepted the values, other
+        interactions never see values that were not saved.
+        """
+        await Player.filter(pk=player.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(player, name, value)
+        self._players[player.discord_id] = player
+
+    def invalidate(self, discord_id: int):
+        """
+        Drop a player, it will be fetched again on the next access.
+        """
+        self._players.pop(discord_id, None)
+
+    def clear(self):
+        self._players.clear()
+
+
+PLAYER_CACHE_SIZE = 10_000
+PLAYER_CACHE_TTL = 60
+players = PlayerCache(PLAYER_CACHE_SIZE, PLAYER_CACHE_TTL)
+
+# what the autocompletion needs to filter and describe an instance
+InventoryItem = namedtuple(
+    "InventoryItem",
+    ["id", "ball_id", "special_id", "shiny", "locked", "favorite", "attack_bonus", "health_bonus"],
+)
+inventory_lookups = Counter(
+    "inventory_cache_lookups", "Lookups of player inventories in the memory cache", ["result"]
+)
+
+
+class InventoryCache:
+    """
+    In-process snapshots of the instances owned by players, so that autocompletion filters
+    them in memory instead of querying the database on every keystroke.
+
+    Snapshots are loaded on first access and kept up to date by the `post_save` and
+    `post_delete` listeners of `BallInstance`, which only know the current owner: code moving
+    an instance to another player must call `remove` with the previous owner. Queries bypassing
+    the listeners (bulk deletes, raw SQL) must call `update` or `invalidate`, and the TTL
+    bounds how long other changes (admin panel) are missed.
+
+    A change received while an inventory is loading may be missing from the loaded rows, each
+    loading player has a generation bumped by changes, and the snapshot is not kept if it
+    changed during the load.
+
+    Attributes
+    ----------
+    maxsize: int
+        Maximum number of instances kept across all inventories, counted when they are loaded.
+        Least recently used inventories are evicted first.
+    ttl: float
+        Number of seconds an inventory is kept before being loaded again.
+    max_items: int
+        Inventories larger than this are not kept in memory, `get` returns `None` for them.
+        Must not be larger than `maxsize`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_items: int):
+        if max_items > maxsize:
+            raise ValueError("An inventory cannot be larger than the whole cache")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_items = max_items
+        self._inventories: TTLCache[int, dict[int, InventoryItem] | None] = TTLCache(
+            maxsize, ttl, getsizeof=lambda inventory: max(len(inventory or ()), 1)
+        )
+        self._loading: dict[int, asyncio.Task[dict[int, InventoryItem] | None]] = {}
+        self._generations: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._inventories)
+
+    async def get(self, player_id: int) -> dict[int, InventoryItem] | None:
+        """
+        Return the instances owned by a player indexed by ID, or `None` if they are too many
+        to be kept in memory.
+        """
+        try:
+            inventory = self._inventories[player_id]
+        except KeyError:
+            inventory_lookups.labels(result="miss").inc()
+        else:
+            inventory_lookups.labels(result="hit").inc()
+            return inventory
+        if (task := self._loading.get(player_id)) is None:
+            self._generations[player_id] = 0
+            task = asyncio.create_task(self._load(player_id))
+            self._loading[player_id] = task
+            task.add_done_callback(lambda _: self._loaded(player_id))
+        # if the caller is cancelled (autocompletion deadline), loading goes on for the next one
+        return await asyncio.shield(task)
+
+    def _loaded(self, player_id: int):
+        self._loading.pop(player_id, None)
+        self._generations.pop(player_id, None)
+
+    def _touch(self, player_id: int | None = None):
+        """
+        Bump the generation of a loading inventory, or of all of them.
+        """
+        for loading_id in self._generations:
+            if player_id is None or loading_id == player_id:
+                self._generations[loading_id] += 1
+
+    async def _load(self, player_id: int) -> dict[int, InventoryItem] | None:
+        generation = self._generations.get(player_id)
+        rows = await (
+            BallInstance.filter(player_id=player_id)
+            .limit(self.max_items + 1)
+            .values_list(*InventoryItem._fields)
+        )
+        if len(rows) > self.max_items:
+            inventory = None
+        else:
+            inventory = {x[0]: InventoryItem._make(x) for x in rows}
+        if self._generations.get(player_id) == generation:
+            self._inventories[player_id] = inventory
+        return inventory
+
+    def update(self, instance: BallInstance):
+        """
+        Store the new state of an instance in the inventory of its owner, if loaded.
+        """
+        self._touch(instance.player_id)
+        inventory = self._inventories.get(instance.player_id)
+        if inventory is not None:
+            inventory[instance.pk] = InventoryItem._make(
+                getattr(instance, x) for x in InventoryItem._fields
+            )
+
+    def remove(self, instance: BallInstance, player_id: int | None = None):
+        """
+        Remove a deleted instance from the inventory of its owner, if loaded.
+
+        Pass the ID of the previous owner when an instance was given to another player.
+        """
+        if player_id is None:
+            player_id = instance.player_id
+        self._touch(player_id)
+        if inventory := self._inventories.get(player_id):
+            inventory.pop(instance.pk, None)
+
+    def invalidate(self, player_id: int):
+        """
+        Drop the inventory of a player, it will be loaded again on the next access.
+        """
+        self._touch(player_id)
+        self._inventories.pop(player_id, None)
+
+    def clear(self):
+        self._touch()
+        self._inventories.clear()
+
+
+INVENTORY_CACHE_SIZE = 200_000
+INVENTORY_CACHE_TTL = 300
+INVENTORY_MAX_ITEMS = 10_000
+inventories = InventoryCache(INVENTORY_CACHE_SIZE, INVENTORY_CACHE_TTL, INVENTORY_MAX_ITEMS)
+
+
+async def update_inventory(
+    model: Type[BallInstance],
+    instance: BallInstance,
+    created: bool,
+    using_db: "BaseDBAsyncClient | None" = None,
+    update_fields: Iterable[str] | None = None,
+):
+    inventories.update(instance)
+
+
+async def remove_from_inventory(
+    model: Type[BallInstance],
+    instance: BallInstance,
+    using_db: "BaseDBAsyncClient | None" = None,
+):
+    inventories.remove(instance)
+
+
+BallInstance.register_listener(signals.Signals.post_save, update_inventory)
+BallInstance.register_listener(signals.Signals.post_delete, remove_from_inventory)
+
+
 class BlacklistedID(models.Model):
     discord_id = fields.BigIntField(
         description="Discord user ID", unique=True, validators=[DiscordSnowflakeValidator()]
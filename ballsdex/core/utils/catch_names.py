@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import unicodedata
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from ballsdex.core.models import Ball
+
+
+def normalize_name(name: str) -> str:
+    """
+    Fold a name for comparison: case-insensitive, without accents and with whitespace
+    collapsed, so that "  Côte  d'Ivoire" and "cote d'ivoire" are equal.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    folded = "".join(x for x in decomposed if not unicodedata.combining(x))
+    return " ".join(folded.split())
+
+
+class CatchNameIndex:
+    """
+    Index of the names accepted to catch each ball: its country name, catch names and
+    translations, normalized with `normalize_name`.
+
+    A name may be shared by multiple balls, so each name maps to a set of ball IDs.
+    """
+
+    def __init__(self):
+        self._balls: dict[str, set[int]] = {}
+        self._names: dict[int, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._balls)
+
+    def build(self, balls: Iterable[Ball]):
+        """
+        Replace the index with the names of the given balls.
+        """
+        self._balls = {}
+        self._names = {}
+        for ball in balls:
+            self.add(ball)
+
+    def add(self, ball: Ball):
+        """
+        Index the names of a single ball, replacing its previous names if any.
+        """
+        for name in self._names.pop(ball.pk, []):
+            self._balls[name].discard(ball.pk)
+        names = [ball.country]
+        if ball.catch_names:
+            names.extend(ball.catch_names.split(";"))
+        if ball.translations:
+            names.extend(ball.translations.split(";"))
+        normalized = list(dict.fromkeys(x for x in map(normalize_name, names) if x))
+        for name in normalized:
+            self._balls.setdefault(name, set()).add(ball.pk)
+        self._names[ball.pk] = normalized
+
+    def matches(self, guess: str, ball: Ball) -> bool:
+        """
+        Whether the guess is an accepted name for this ball. Balls missing from the index
+        are indexed on the fly.
+        """
+        if ball.pk not in self._names:
+            self.add(ball)
+        return ball.pk in self._balls.get(normalize_name(guess), ())
+
+    def lookup(self, name: str) -> set[int]:
+        """
+        Return the IDs of the balls accepting this name.
+        """
+        return set(self._balls.get(normalize_name(name), ()))
+
+    def names(self, ball_id: int) -> list[str]:
+        """
+        Return the normalized names accepted for this ball ID.
+        """
+        return list(self._names.get(ball_id, ()))
+
+    def search(self, text: str) -> set[int]:
+        """
+        Return the IDs of the balls having a name containing this text.
+        """
+        text = normalize_name(text)
+        if not text:
+            return set(self._names)
+        return {pk for pk, names in self._names.items() if any(text in x for x in names)}
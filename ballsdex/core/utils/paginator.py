@@ -8,6 +8,7 @@ from typing import TYPE_CHECKING, Any, Dict, Optional
 import discord
 from discord.ext.commands import Paginator as CommandPaginator
 
+from ballsdex.core.image_generator.render_pool import RenderPoolBusy
 from ballsdex.core.utils import menus
 
 if TYPE_CHECKING:
@@ -169,13 +170,15 @@ class Pages(discord.ui.View):
     async def on_error(
         self, interaction: discord.Interaction, error: Exception, item: discord.ui.Item
     ) -> None:
-        log.error("Error on pagination", exc_info=error)
+        if isinstance(error, RenderPoolBusy):
+            message = error.message
+        else:
+            log.error("Error on pagination", exc_info=error)
+            message = "An unknown error occurred, sorry"
         if interaction.response.is_done():
-            await interaction.followup.send("An unknown error occurred, sorry", ephemeral=True)
+            await interaction.followup.send(message, ephemeral=True)
         else:
-            await interaction.response.send_message(
-                "An unknown error occurred, sorry", ephemeral=True
-            )
+            await interaction.response.send_message(message, ephemeral=True)
 
     async def start(self, *, content: Optional[str] = None, ephemeral: bool = False) -> None:
         if (
@@ -0,0 +1,105 @@
+import random
+from typing import Callable, Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class WeightedSampler(Generic[T]):
+    """
+    Draw weighted random items in constant time, using Walker's alias method.
+
+    Building the tables is O(n) and must be done again whenever the items or their weights
+    change, drawing an item is then O(1) regardless of the number of items. Items with a
+    weight of zero or less are never drawn.
+
+    Attributes
+    ----------
+    items: list[T]
+        The items that can be drawn.
+    total: float
+        Sum of the weights of the items.
+    """
+
+    def __init__(self, items: Iterable[T] = (), weight: Callable[[T], float] = lambda x: 1):
+        self.items: list[T] = []
+        self.total = 0.0
+        self._probabilities: list[float] = []
+        self._aliases: list[int] = []
+        self.build(items, weight)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def build(self, items: Iterable[T], weight: Callable[[T], float]):
+        """
+        Replace the items of the sampler and rebuild the alias tables.
+
+        Parameters
+        ----------
+        items: Iterable[T]
+            The items that can be drawn.
+        weight: Callable[[T], float]
+            Function returning the weight of an item.
+        """
+        weighted = [(item, float(weight(item))) for item in items]
+        weighted = [(item, w) for item, w in weighted if w > 0]
+        total = sum(w for _, w in weighted)
+        n = len(weighted)
+
+        probabilities = [w * n / total for _, w in weighted] if n else []
+        aliases = list(range(n))
+        small = [i for i, p in enumerate(probabilities) if p < 1]
+        large = [i for i, p in enumerate(probabilities) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            aliases[less] = more
+            # the overflowing column gives its excess to fill the other one
+            probabilities[more] += probabilities[less] - 1
+            (small if probabilities[more] < 1 else large).append(more)
+        # what is left only differs from 1 because of rounding errors
+        for i in small + large:
+            probabilities[i] = 1
+
+        # swapped at once, a concurrent draw never sees half-built tables
+        self.items, self.total = [item for item, _ in weighted], total
+        self._probabilities, self._aliases = probabilities, aliases
+
+    def choice(self, rng: random.Random | None = None) -> T:
+        """
+        Draw a single item.
+
+        Raises
+        ------
+        IndexError
+            There is no item to draw.
+        """
+        return self.sample(1, rng)[0]
+
+    def sample(self, k: int, rng: random.Random | None = None) -> list[T]:
+        """
+        Draw `k` items independently, with replacement.
+
+        Parameters
+        ----------
+        k: int
+            Number of items to draw.
+        rng: random.Random | None
+            Source of randomness, defaults to the `random` module.
+
+        Raises
+        ------
+        IndexError
+            There is no item to draw.
+        """
+        items, probabilities, aliases = self.items, self._probabilities, self._aliases
+        if not items:
+            raise IndexError("Cannot draw from an empty sampler")
+        rand = (rng or random).random
+        n = len(items)
+        result: list[T] = []
+        for _ in range(k):
+            x = rand() * n
+            i = min(int(x), n - 1)  # x may round up to n
+            # the fractional part is uniform too, saving a second call to random
+            result.append(items[i] if x - i < probabilities[i] else items[aliases[i]])
+        return result
@@ -0,0 +1,129 @@
+from bisect import bisect_left
+from typing import Callable, Generic, Iterable, TypeVar
+
+from ballsdex.core.utils.catch_names import normalize_name
+
+T = TypeVar("T")
+
+# sorts after any character of a name, to find the end of a prefix range
+PREFIX_END = "\uffff"
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Return the trigrams of each word of a normalized text, padded like `pg_trgm` does.
+    """
+    result: set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class SearchIndex(Generic[T]):
+    """
+    Index of items searched by name for autocompletion.
+
+    Matches are returned in tiers: names starting with the text, then names with a word
+    starting with the text, then names containing the text, then names similar to the text
+    to tolerate typos. Inside a tier, items are ranked by descending rank, then by name.
+
+    Prefixes are found with a binary search in sorted tables, similar names by counting the
+    trigrams they share with the text. The index must be rebuilt when the items change.
+
+    Attributes
+    ----------
+    items: list[T]
+        The indexed items, sorted by rank.
+    min_similarity: float
+        Minimum trigram similarity, between 0 and 1, for a name to match despite typos.
+    """
+
+    def __init__(self, min_similarity: float = 0.3):
+        self.items: list[T] = []
+        self.min_similarity = min_similarity
+        self._keys: list[str] = []
+        self._names: list[tuple[str, int]] = []
+        self._words: list[tuple[str, int]] = []
+        self._trigrams: dict[str, list[int]] = {}
+        self._trigram_counts: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def build(
+        self, items: Iterable[T], key: Callable[[T], str], rank: Callable[[T], float] = lambda x: 0
+    ):
+        """
+        Replace the items of the index.
+
+        Parameters
+        ----------
+        items: Iterable[T]
+            The items to search.
+        key: Callable[[T], str]
+            Function returning the name of an item.
+        rank: Callable[[T], float]
+            Function returning the rank of an item, higher ranks are returned first.
+        """
+        keyed = [(normalize_name(key(item)), item) for item in items]
+        keyed.sort(key=lambda x: (-rank(x[1]), x[0]))
+        self.items = [item for _, item in keyed]
+        self._keys = [name for name, _ in keyed]
+
+        # indexes are positions in the ranking, so sorting them sorts by rank
+        self._names = sorted((name, i) for i, name in enumerate(self._keys))
+        self._words = sorted(
+            (name[offset + 1 :], i)
+            for i, name in enumerate(self._keys)
+            for offset, char in enumerate(name)
+            if char == " "
+        )
+        self._trigrams = {}
+        self._trigram_counts = []
+        for i, name in enumerate(self._keys):
+            grams = trigrams(name)
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(i)
+            self._trigram_counts.append(len(grams))
+
+    @staticmethod
+    def _prefixed(table: list[tuple[str, int]], text: str) -> list[int]:
+        start = bisect_left(table, (text,))
+        end = bisect_left(table, (text + PREFIX_END,), start)
+        return sorted({i for _, i in table[start:end]})
+
+    def _similar(self, text: str) -> list[int]:
+        grams = trigrams(text)
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for i in self._trigrams.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scores = [
+            (count / (len(grams) + self._trigram_counts[i] - count), i)
+            for i, count in shared.items()
+        ]
+        scores.sort(key=lambda x: (-x[0], x[1]))
+        return [i for score, i in scores if score >= self.min_similarity]
+
+    def search(self, text: str, limit: int = 25) -> list[T]:
+        """
+        Return the items best matching the text, or the highest ranked items if it is empty.
+        """
+        text = normalize_name(text)
+        if not text:
+            return self.items[:limit]
+
+        found: dict[int, None] = {}
+        tiers = (
+            lambda: self._prefixed(self._names, text),
+            lambda: self._prefixed(self._words, text),
+            lambda: [i for i, name in enumerate(self._keys) if text in name],
+            lambda: self._similar(text) if len(text) >= 3 else [],
+        )
+        for tier in tiers:
+            for i in tier():
+                found.setdefault(i)
+                if len(found) == limit:
+                    return [self.items[i] for i in found]
+        return [self.items[i] for i in found]
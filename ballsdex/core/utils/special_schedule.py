@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import random
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from ballsdex.core.models import Special
+
+# end dates are inclusive, an interval ending on them stops right after
+END_OFFSET = timedelta(microseconds=1)
+
+
+@dataclass(slots=True)
+class SpecialSlot:
+    """
+    Specials running during one interval of the schedule.
+
+    Attributes
+    ----------
+    specials: list[Special]
+        The running specials.
+    population: list[Special | None]
+        The running specials followed by `None`, representing a common card.
+    cum_weights: list[float]
+        Cumulative weights of `population`, to be passed to `random.choices`.
+    """
+
+    specials: list[Special] = field(default_factory=list)
+    population: list[Special | None] = field(default_factory=list)
+    cum_weights: list[float] = field(default_factory=list)
+
+    @classmethod
+    def from_specials(cls, specials: list[Special]) -> SpecialSlot:
+        if not specials:
+            return cls()
+        # the rarity field is a value between 0 and 1, 1 being no common and 0 only common,
+        # so the chance of having a common card is the sum of the remaining (1-rarity)
+        common_weight = sum(1 - x.rarity for x in specials)
+        weights = [x.rarity for x in specials] + [common_weight]
+        return cls(specials, [*specials, None], list(accumulate(weights)))
+
+
+class SpecialSchedule:
+    """
+    Time-indexed schedule of the specials, to find the running ones without scanning them all.
+
+    The start and end dates of every special split time into intervals, during which the same
+    specials are running. The intervals and their weights are computed once when building
+    the schedule, finding the current one is then a binary search, skipped while the last
+    interval found is still current.
+    """
+
+    def __init__(self):
+        self._boundaries: list[datetime] = []
+        self._slots: list[SpecialSlot] = [SpecialSlot()]
+        self._current: tuple[datetime | None, datetime | None, SpecialSlot] = (
+            None,
+            None,
+            self._slots[0],
+        )
+
+    def __len__(self) -> int:
+        return len(self._boundaries)
+
+    def build(self, specials: Iterable[Special]):
+        """
+        Replace the schedule with the given specials.
+        """
+        specials = [x for x in specials if x.start_date <= x.end_date]
+        boundaries = sorted(
+            {x.start_date for x in specials} | {x.end_date + END_OFFSET for x in specials}
+        )
+        # slot 0 is before the first boundary, slot i starts on boundaries[i - 1]
+        slots = [SpecialSlot()]
+        for start in boundaries:
+            slots.append(
+                SpecialSlot.from_specials(
+                    [x for x in specials if x.start_date <= start < x.end_date + END_OFFSET]
+                )
+            )
+        self._boundaries = boundaries
+        self._slots = slots
+        self._current = (None, boundaries[0] if boundaries else None, slots[0])
+
+    def _locate(self, now: datetime) -> tuple[datetime | None, datetime | None, SpecialSlot]:
+        index = bisect_right(self._boundaries, now)
+        start = self._boundaries[index - 1] if index else None
+        end = self._boundaries[index] if index < len(self._boundaries) else None
+        return (start, end, self._slots[index])
+
+    def slot(self, now: datetime) -> SpecialSlot:
+        """
+        Return the interval of the schedule containing the given time.
+        """
+        start, end, slot = self._current
+        if (start is None or start <= now) and (end is None or now < end):
+            return slot
+        self._current = self._locate(now)
+        return self._current[2]
+
+    def running(self, now: datetime) -> list[Special]:
+        """
+        Return the specials running at the given time.
+        """
+        return self.slot(now).specials
+
+    def pick(self, now: datetime, rng: random.Random | None = None) -> Special | None:
+        """
+        Draw the special background of a card caught at the given time, weighted by the
+        rarity of the running specials, or `None` for a common card.
+        """
+        slot = self.slot(now)
+        if not slot.specials:
+            return None
+        return (rng or random).choices(slot.population, cum_weights=slot.cum_weights)[0]
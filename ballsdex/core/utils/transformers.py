@@ -1,27 +1,36 @@
+import asyncio
 import logging
 import time
 from datetime import timedelta
 from enum import Enum
-from typing import TYPE_CHECKING, Generic, Iterable, Optional, TypeVar
+from typing import TYPE_CHECKING, AsyncIterator, Generic, Iterable, Optional, TypeVar
 
 import discord
 from discord import app_commands
 from discord.interactions import Interaction
+from prometheus_client import Counter, Histogram
 from tortoise.exceptions import DoesNotExist
 from tortoise.expressions import Q, RawSQL
 from tortoise.models import Model
+from tortoise.queryset import QuerySet
 from tortoise.timezone import now as tortoise_now
 
 from ballsdex.core.models import (
     Ball,
     BallInstance,
     Economy,
+    InventoryItem,
     Regime,
     Special,
     balls,
+    catch_names,
     economies,
+    inventories,
+    players,
     regimes,
+    specials,
 )
+from ballsdex.core.utils.search_index import SearchIndex
 from ballsdex.settings import settings
 
 if TYPE_CHECKING:
@@ -29,6 +38,19 @@ if TYPE_CHECKING:
 
 log = logging.getLogger("ballsdex.core.utils.transformers")
 T = TypeVar("T", bound=Model)
+HEX_DIGITS = frozenset("0123456789abcdef")
+# maximum number of autocompletion options accepted by Discord
+AUTOCOMPLETE_LIMIT = 25
+
+autocomplete_latency = Histogram(
+    "autocomplete_latency",
+    "Time spent generating autocompletion options",
+    ["transformer", "results"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 1.5, 2, 3),
+)
+autocomplete_timeouts = Counter(
+    "autocomplete_timeouts", "Autocompletions that exceeded the deadline", ["transformer"]
+)
 
 __all__ = (
     "BallTransform",
@@ -101,22 +123,38 @@ class ModelTransformer(app_commands.Transformer, Generic[T]):
         """
         return await self.model.get(pk=value)
 
-    async def get_options(
+    def get_options(
         self, interaction: discord.Interaction["BallsDexBot"], value: str
-    ) -> list[app_commands.Choice[int]]:
+    ) -> AsyncIterator[app_commands.Choice[str]]:
         """
-        Generate the list of options for autocompletion
+        Generate the options for autocompletion, best matches first.
+
+        Options must be yielded as soon as they are found, past the deadline the options
+        already yielded are returned.
         """
         raise NotImplementedError()
 
     async def autocomplete(
         self, interaction: Interaction["BallsDexBot"], value: str
-    ) -> list[app_commands.Choice[int]]:
-        t1 = time.time()
-        choices: list[app_commands.Choice[int]] = []
-        for option in await self.get_options(interaction, value):
-            choices.append(option)
-        t2 = time.time()
+    ) -> list[app_commands.Choice[str]]:
+        transformer = type(self).__name__
+        t1 = time.perf_counter()
+        choices: list[app_commands.Choice[str]] = []
+        try:
+            # past the deadline, return what was found so far instead of letting Discord fail
+            async with asyncio.timeout(settings.autocomplete_deadline):
+                async for option in self.get_options(interaction, value):
+                    choices.append(option)
+                    if len(choices) == AUTOCOMPLETE_LIMIT:
+                        break
+        except TimeoutError:
+            autocomplete_timeouts.labels(transformer=transformer).inc()
+            log.warning(
+                f"{self.name.title()} autocompletion exceeded the deadline of "
+                f"{settings.autocomplete_deadline}s, {len(choices)} results returned"
+            )
+        t2 = time.perf_counter()
+        autocomplete_latency.labels(transformer=transformer, results=len(choices)).observe(t2 - t1)
         log.debug(
             f"{self.name.title()} autocompletion took "
             f"{round((t2 - t1) * 1000)}ms, {len(choices)} results"
@@ -158,95 +196,181 @@ class BallInstanceTransformer(ModelTransformer[BallInstance]):
         if item.player.discord_id != interaction.user.id:
             raise ValidationError(f"That {settings.collectible_name} doesn't belong to you.")
 
+    @staticmethod
+    def search(queryset: QuerySet[BallInstance], value: str) -> list[QuerySet[BallInstance]]:
+        """
+        Return the queries of the instances with a ball name, then a hexadecimal ID containing
+        the given text, to run in this order. The list is empty if none can match.
+
+        Names are matched in memory with the catch names index, the queries then only use the
+        `(player_id, ball_id)` and ID trigram indexes, without joining the ball table.
+        """
+        value = value.replace(".", "").strip().lower()
+        if not value:
+            return [queryset]
+        stages: list[QuerySet[BallInstance]] = []
+        if ball_ids := catch_names.search(value):
+            stages.append(queryset.filter(ball_id__in=ball_ids))
+        if all(x in HEX_DIGITS for x in value):
+            # same expression as the trigram index, the value is only made of hex digits
+            hex_match = RawSQL(f'(to_hex("ballinstance"."id") LIKE \'%{value}%\')')
+            stages.append(queryset.annotate(hex_match=hex_match).filter(hex_match=True))
+        return stages
+
+    @staticmethod
+    def filter_inventory(
+        inventory: dict[int, InventoryItem],
+        value: str,
+        special_id: int | None = None,
+        shiny: bool | None = None,
+        trade_type: TradeCommandType | None = None,
+        limit: int = AUTOCOMPLETE_LIMIT,
+    ) -> list[BallInstance]:
+        """
+        Same as `search` and the filters of `get_options`, on an inventory snapshot.
+        """
+        value = value.replace(".", "").strip().lower()
+        ball_ids = catch_names.search(value) if value else set()
+        search_hex = all(x in HEX_DIGITS for x in value)
+        if value and not ball_ids and not search_hex:
+            return []
+        lock_limit = tortoise_now() - timedelta(minutes=30)
+
+        instances: list[BallInstance] = []
+        for item in inventory.values():
+            if special_id is not None and item.special_id != special_id:
+                continue
+            if shiny and not item.shiny:
+                continue
+            if trade_type == TradeCommandType.PICK:
+                if item.locked is not None and item.locked >= lock_limit:
+                    continue
+            elif trade_type:
+                if item.locked is None or item.locked <= lock_limit:
+                    continue
+            if value and item.ball_id not in ball_ids:
+                if not search_hex or value not in f"{item.id:x}":
+                    continue
+            instances.append(BallInstance._init_from_db(**item._asdict()))
+            if len(instances) == limit:
+                break
+        return instances
+
     async def get_options(
         self, interaction: Interaction["BallsDexBot"], value: str
-    ) -> list[app_commands.Choice[int]]:
-        balls_queryset = BallInstance.filter(player__discord_id=interaction.user.id)
-
+    ) -> AsyncIterator[app_commands.Choice[str]]:
+        player = await players.get(interaction.user.id)
+        if player is None:
+            return
+        special_id: int | None = None
         if (special := getattr(interaction.namespace, "special", None)) and special.isdigit():
-            balls_queryset = balls_queryset.filter(special_id=int(special))
-        if (shiny := getattr(interaction.namespace, "shiny", None)) and shiny is not None:
+            special_id = int(special)
+        shiny = getattr(interaction.namespace, "shiny", None)
+        trade_type = interaction.command.extras.get("trade") if interaction.command else None
+
+        # the snapshot avoids a query on every keystroke, unless the inventory is too large
+        if (inventory := await inventories.get(player.pk)) is not None:
+            for instance in self.filter_inventory(inventory, value, special_id, shiny, trade_type):
+                yield self.choice(interaction, instance)
+        else:
+            async for instance in self.query_instances(
+                player.pk, value, special_id, shiny, trade_type
+            ):
+                yield self.choice(interaction, instance)
+
+    @staticmethod
+    def choice(
+        interaction: Interaction["BallsDexBot"], instance: BallInstance
+    ) -> app_commands.Choice[str]:
+        return app_commands.Choice(
+            name=instance.description(bot=interaction.client), value=str(instance.pk)
+        )
+
+    async def query_instances(
+        self,
+        player_id: int,
+        value: str,
+        special_id: int | None = None,
+        shiny: bool | None = None,
+        trade_type: TradeCommandType | None = None,
+        limit: int = AUTOCOMPLETE_LIMIT,
+    ) -> AsyncIterator[BallInstance]:
+        """
+        Query the instances matching the autocompletion, for inventories too large to be kept
+        in memory. Each stage of `search` is a separate query, its results are yielded before
+        running the next one.
+        """
+        balls_queryset = BallInstance.filter(player_id=player_id)
+        if special_id is not None:
+            balls_queryset = balls_queryset.filter(special_id=special_id)
+        if shiny:
             balls_queryset = balls_queryset.filter(shiny=shiny)
 
-        if interaction.command and (trade_type := interaction.command.extras.get("trade", None)):
-            if trade_type == TradeCommandType.PICK:
-                balls_queryset = balls_queryset.filter(
-                    Q(
-                        Q(locked__isnull=True)
-                        | Q(locked__lt=tortoise_now() - timedelta(minutes=30))
-                    )
-                )
-            else:
-                balls_queryset = balls_queryset.filter(
-                    locked__isnull=False, locked__gt=tortoise_now() - timedelta(minutes=30)
-                )
-        balls_queryset = (
-            balls_queryset.select_related("ball")
-            .annotate(
-                searchable=RawSQL(
-                    "to_hex(ballinstance.id) || ' ' || ballinstance__ball.country || "
-                    "' ' || ballinstance__ball.catch_names"
-                )
+        if trade_type == TradeCommandType.PICK:
+            balls_queryset = balls_queryset.filter(
+                Q(Q(locked__isnull=True) | Q(locked__lt=tortoise_now() - timedelta(minutes=30)))
             )
-            .filter(searchable__icontains=value.replace(".", ""))
-            .limit(25)
-        )
-
-        choices: list[app_commands.Choice] = [
-            app_commands.Choice(name=x.description(bot=interaction.client), value=str(x.pk))
-            for x in await balls_queryset
-        ]
-        return choices
+        elif trade_type:
+            balls_queryset = balls_queryset.filter(
+                locked__isnull=False, locked__gt=tortoise_now() - timedelta(minutes=30)
+            )
+        found: set[int] = set()
+        for queryset in self.search(balls_queryset, value):
+            if found:
+                queryset = queryset.exclude(id__in=found)
+            for instance in await queryset.limit(limit - len(found)):
+                found.add(instance.pk)
+                yield instance
+            if len(found) >= limit:
+                return
 
 
 class TTLModelTransformer(ModelTransformer[T]):
     """
-    Base class for simple Tortoise model autocompletion with TTL cache.
+    Base class for simple Tortoise model autocompletion from the cache.
 
     This is used in most cases except for BallInstance which requires special handling depending
     on the interaction passed.
 
+    Items are searched with a `SearchIndex`, rebuilt when `BallsDexBot.load_cache` bumps
+    `BallsDexBot.cache_version`.
+
     Attributes
     ----------
-    ttl: float
-        Delay in seconds for `items` to live until refreshed with `load_items`, defaults to 300
+    version: int
+        Cache version of `items`, or -1 if they were never loaded.
     """
 
-    ttl: float = 300
-
     def __init__(self):
         self.items: dict[int, T] = {}
-        self.search_map: dict[T, str] = {}
-        self.last_refresh: float = 0
+        self.index: SearchIndex[T] = SearchIndex()
+        self.version: int = -1
         log.debug(f"Inited transformer for {self.name}")
 
+    def rank(self, model: T) -> float:
+        """
+        Return the rank of an item in search results, higher ranks are listed first.
+        """
+        return 0
+
     async def load_items(self) -> Iterable[T]:
         """
         Query values to fill `items` with.
         """
         return await self.model.all()
 
-    async def maybe_refresh(self):
-        t = time.time()
-        if t - self.last_refresh > self.ttl:
+    async def maybe_refresh(self, version: int):
+        if version != self.version:
             self.items = {x.pk: x for x in await self.load_items()}
-            self.last_refresh = t
-            self.search_map = {x: self.key(x).lower() for x in self.items.values()}
+            self.index.build(self.items.values(), self.key, self.rank)
+            self.version = version
 
     async def get_options(
         self, interaction: Interaction["BallsDexBot"], value: str
-    ) -> list[app_commands.Choice[str]]:
-        await self.maybe_refresh()
-
-        i = 0
-        choices: list[app_commands.Choice] = []
-        for item in self.items.values():
-            if value.lower() in self.search_map[item]:
-                choices.append(app_commands.Choice(name=self.key(item), value=str(item.pk)))
-                i += 1
-                if i == 25:
-                    break
-        return choices
+    ) -> AsyncIterator[app_commands.Choice[str]]:
+        await self.maybe_refresh(interaction.client.cache_version)
+        for item in self.index.search(value, AUTOCOMPLETE_LIMIT):
+            yield app_commands.Choice(name=self.key(item), value=str(item.pk))
 
 
 class BallTransformer(TTLModelTransformer[Ball]):
@@ -256,6 +380,9 @@ class BallTransformer(TTLModelTransformer[Ball]):
     def key(self, model: Ball) -> str:
         return model.country
 
+    def rank(self, model: Ball) -> float:
+        return model.rarity
+
     async def load_items(self) -> Iterable[Ball]:
         return balls.values()
 
@@ -286,10 +413,16 @@ class SpecialTransformer(TTLModelTransformer[Special]):
     def key(self, model: Special) -> str:
         return model.name
 
+    def rank(self, model: Special) -> float:
+        return model.rarity
+
+    async def load_items(self) -> Iterable[Special]:
+        return specials.values()
+
 
 class SpecialEnabledTransformer(SpecialTransformer):
     async def load_items(self) -> Iterable[Special]:
-        return await Special.filter(hidden=False).all()
+        return [x for x in specials.values() if not x.hidden]
 
 
 class RegimeTransformer(TTLModelTransformer[Regime]):
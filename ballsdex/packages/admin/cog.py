@@ -21,10 +21,11 @@ from ballsdex.core.models import (
     BlacklistedGuild,
     BlacklistedID,
     BlacklistHistory,
-    GuildConfig,
-    Player,
     Trade,
     TradeObject,
+    guild_configs,
+    inventories,
+    players,
 )
 from ballsdex.core.utils.buttons import ConfirmChoiceView
 from ballsdex.core.utils.enums import DONATION_POLICY_MAP, PRIVATE_POLICY_MAP
@@ -241,19 +242,14 @@ class Admin(commands.GroupCog):
         penalities: list[str] = []
         if guild.member_count < 5 or guild.member_count > 1000:
             penalities.append("Server has less than 5 or more than 1000 members")
-        if any(len(x.content) < 5 for x in cooldown.message_cache):
+        if cooldown.message_cache.short_messages:
             penalities.append("Some cached messages are less than 5 characters long")
 
-        authors_set = set(x.author_id for x in cooldown.message_cache)
-        low_chatters = len(authors_set) < 4
+        authors = cooldown.message_cache.authors
+        low_chatters = len(authors) < 4
         # check if one author has more than 40% of messages in cache
-        major_chatter = any(
-            (
-                len(list(filter(lambda x: x.author_id == author, cooldown.message_cache)))
-                / cooldown.message_cache.maxlen  # type: ignore
-                > 0.4
-            )
-            for author in authors_set
+        major_chatter = bool(authors) and (
+            max(authors.values()) / cooldown.message_cache.maxlen > 0.4
         )
         # this mess is needed since either conditions make up to a single penality
         if low_chatters:
@@ -289,7 +285,7 @@ class Admin(commands.GroupCog):
         )
 
         informations: list[str] = []
-        if cooldown.lock.locked():
+        if cooldown.on_cooldown:
             informations.append("The manager is currently on cooldown.")
         if delta < 600:
             informations.append(
@@ -364,7 +360,7 @@ class Admin(commands.GroupCog):
 
         entries: list[tuple[str, str]] = []
         for guild in guilds:
-            if config := await GuildConfig.get_or_none(guild_id=guild.id):
+            if config := await guild_configs.get(guild.id):
                 spawn_enabled = config.enabled and config.guild_id
             else:
                 spawn_enabled = False
@@ -446,11 +442,11 @@ class Admin(commands.GroupCog):
         )
         task = self.bot.loop.create_task(update_message_loop())
         try:
-            for i in range(n):
-                if not countryball:
-                    ball = await CountryBall.get_random()
-                else:
-                    ball = CountryBall(countryball)
+            if not countryball:
+                bomb = await CountryBall.get_random_many(n)
+            else:
+                bomb = [CountryBall(countryball) for _ in range(n)]
+            for ball in bomb:
                 ball.force_shiny = shiny
                 result = await ball.spawn(channel)
                 if not result:
@@ -575,7 +571,7 @@ class Admin(commands.GroupCog):
             return
         await interaction.response.defer(ephemeral=True, thinking=True)
 
-        player, created = await Player.get_or_create(discord_id=user.id)
+        player = await players.get_or_create(user.id)
         instance = await BallInstance.create(
             ball=countryball,
             player=player,
@@ -878,6 +874,8 @@ class Admin(commands.GroupCog):
             )
         else:
             self.bot.blacklist_guild.add(guild.id)
+            # interactions from this guild are now ignored, no need to keep its config
+            guild_configs.invalidate(guild.id)
             await interaction.response.send_message("Guild is now blacklisted.", ephemeral=True)
         await log_action(
             f"{interaction.user} blacklisted the guild {guild}({guild.id}) "
@@ -1110,9 +1108,10 @@ class Admin(commands.GroupCog):
                 f"The {settings.collectible_name} ID you gave does not exist.", ephemeral=True
             )
             return
-        player, _ = await Player.get_or_create(discord_id=user.id)
+        player = await players.get_or_create(user.id)
         ball.player = player
         await ball.save()
+        inventories.remove(ball, original_player.pk)
 
         trade = await Trade.create(player1=original_player, player2=player)
         await TradeObject.create(trade=trade, ballinstance=ball, player=original_player)
@@ -1140,7 +1139,7 @@ class Admin(commands.GroupCog):
         percentage: int | None
             The percentage of countryballs to delete, if not all. Used for sanctions.
         """
-        player = await Player.get(discord_id=user.id)
+        player = await players.get(user.id)
         if not player:
             await interaction.response.send_message(
                 "The user you gave does not exist.", ephemeral=True
@@ -1177,6 +1176,7 @@ class Admin(commands.GroupCog):
             count = len(to_delete)
         else:
             count = await BallInstance.filter(player=player).delete()
+            inventories.invalidate(player.pk)
         await interaction.followup.send(
             f"{count} {settings.plural_collectible_name} from {user} have been deleted.",
             ephemeral=True,
@@ -1633,7 +1633,7 @@ class Admin(commands.GroupCog):
                 )
                 return
 
-        if config := await GuildConfig.get_or_none(guild_id=guild.id):
+        if config := await guild_configs.get(guild.id):
             spawn_enabled = config.enabled and config.guild_id
         else:
             spawn_enabled = False
@@ -1688,7 +1688,7 @@ class Admin(commands.GroupCog):
             The amount of days to look back for the amount of countryballs caught.
         """
         await interaction.response.defer(ephemeral=True, thinking=True)
-        player = await Player.get_or_none(discord_id=user.id)
+        player = await players.get(user.id)
         if not player:
             await interaction.followup.send("The user you gave does not exist.", ephemeral=True)
             return
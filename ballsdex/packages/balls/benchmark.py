@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from ballsdex.packages.countryballs.benchmark import format_time
+
+# rows are inserted with a single statement, cycling through the given ball IDs
+SEED_QUERY = """
+INSERT INTO "ballinstance" (
+    "ball_id", "player_id", "catch_date", "shiny", "attack_bonus", "health_bonus",
+    "favorite", "tradeable", "extra_data"
+)
+SELECT ($2::INT[])[1 + i % cardinality($2::INT[])], $1, NOW(), FALSE, 0, 0, FALSE, TRUE,
+    '{}'::JSONB
+FROM generate_series(1, $3) AS i
+"""
+
+
+async def measure(func: Callable[[], Awaitable[object]], iterations: int) -> list[float]:
+    times: list[float] = []
+    for _ in range(iterations):
+        t1 = time.perf_counter()
+        await func()
+        times.append(time.perf_counter() - t1)
+    return times
+
+
+async def bench_autocomplete(database: str, instances: int, iterations: int) -> Table:
+    """
+    Compare the latency of the instance autocompletion query before and after the search
+    indexes, for a player owning the given number of instances. The player and its instances
+    are created then deleted, use a migrated database with balls that can be written to.
+    """
+    from tortoise import Tortoise
+    from tortoise.expressions import RawSQL
+
+    from ballsdex.core.models import Ball, BallInstance, Player, catch_names
+    from ballsdex.core.utils.transformers import BallInstanceTransformer
+
+    await Tortoise.init(db_url=database, modules={"models": ["ballsdex.core.models"]})
+    discord_id = 10**17
+    table = Table(box=box.SIMPLE, title=f"Autocompletion of {instances} instances")
+    table.add_column("Search", style="cyan")
+    table.add_column("Concatenation p50", justify="right")
+    table.add_column("Concatenation p99", justify="right")
+    table.add_column("Indexed p50", justify="right", style="green")
+    table.add_column("Indexed p99", justify="right", style="green")
+    try:
+        all_balls = await Ball.all()
+        if not all_balls:
+            raise RuntimeError("The database needs at least one ball")
+        catch_names.build(all_balls)
+        await Player.filter(discord_id=discord_id).delete()
+        player = await Player.create(discord_id=discord_id)
+        connection = Tortoise.get_connection("default")
+        await connection.execute_query(
+            SEED_QUERY, [player.pk, [x.pk for x in all_balls], instances]
+        )
+        await connection.execute_script('ANALYZE "ballinstance"')
+        last = await BallInstance.filter(player=player).order_by("-id").first()
+        if last is None:
+            raise RuntimeError("No instance was seeded")
+
+        async def concatenation(value: str):
+            # what the autocompletion used to query
+            await (
+                BallInstance.filter(player__discord_id=discord_id)
+                .select_related("ball")
+                .annotate(
+                    searchable=RawSQL(
+                        "to_hex(ballinstance.id) || ' ' || ballinstance__ball.country || "
+                        "' ' || ballinstance__ball.catch_names"
+                    )
+                )
+                .filter(searchable__icontains=value)
+                .limit(25)
+            )
+
+        async def indexed(value: str):
+            found = 0
+            queryset = BallInstance.filter(player=player)
+            for stage in BallInstanceTransformer.search(queryset, value):
+                found += len(await stage.limit(25 - found))
+                if found >= 25:
+                    break
+
+        searches = {
+            "Empty": "",
+            "Name prefix": all_balls[0].country[:3],
+            "Full name": all_balls[-1].country,
+            "ID": f"{last.pk:x}"[-4:],
+            "No match": "zzzzzz",
+        }
+        for name, value in searches.items():
+            old = await measure(lambda: concatenation(value), iterations)
+            new = await measure(lambda: indexed(value), iterations)
+            old_percentiles = statistics.quantiles(old, n=100, method="inclusive")
+            new_percentiles = statistics.quantiles(new, n=100, method="inclusive")
+            table.add_row(
+                f"{name} ({value!r})",
+                format_time(statistics.median(old)),
+                format_time(old_percentiles[98]),
+                format_time(statistics.median(new)),
+                format_time(new_percentiles[98]),
+            )
+    finally:
+        await Player.filter(discord_id=discord_id).delete()
+        await Tortoise.close_connections()
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m ballsdex.packages.balls.benchmark",
+        description="Measure the performance of the instance autocompletion",
+    )
+    parser.add_argument(
+        "database",
+        help="URL of a migrated PostgreSQL database, a player and its instances are created "
+        "then deleted. Do not use the production database",
+    )
+    parser.add_argument(
+        "--instances", type=int, default=50_000, help="Number of instances of the player"
+    )
+    parser.add_argument(
+        "--iterations", "-n", type=int, default=50, help="Number of queries of each measure"
+    )
+    args = parser.parse_args()
+
+    console = Console()
+    with console.status("Seeding and querying..."):
+        table = asyncio.run(bench_autocomplete(args.database, args.instances, args.iterations))
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
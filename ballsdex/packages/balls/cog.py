@@ -1,6 +1,5 @@
 import enum
 import logging
-from collections import defaultdict
 from typing import TYPE_CHECKING, Union
 
 import discord
@@ -8,6 +7,8 @@ from discord import app_commands
 from discord.ext import commands
 from discord.ui import Button, View, button
 from tortoise.exceptions import DoesNotExist
+from tortoise.expressions import RawSQL
+from tortoise.queryset import QuerySet
 
 from ballsdex.core.models import (
     BallInstance,
@@ -17,6 +18,8 @@ from ballsdex.core.models import (
     Trade,
     TradeObject,
     balls,
+    inventories,
+    players,
 )
 from ballsdex.core.utils.buttons import ConfirmChoiceView
 from ballsdex.core.utils.paginator import FieldPageSource, Pages
@@ -26,7 +29,11 @@ from ballsdex.core.utils.transformers import (
     SpecialEnabledTransform,
     TradeCommandType,
 )
-from ballsdex.packages.balls.countryballs_paginator import CountryballsViewer
+from ballsdex.packages.balls.countryballs_paginator import (
+    CountryballsViewer,
+    KeysetSource,
+    SortKey,
+)
 from ballsdex.settings import settings
 
 if TYPE_CHECKING:
@@ -79,6 +86,7 @@ class DonationRequest(View):
         self.countryball.trade_player = self.countryball.player
         self.countryball.player = self.new_player
         await self.countryball.save()
+        inventories.remove(self.countryball, self.countryball.trade_player_id)
         trade = await Trade.create(player1=self.countryball.trade_player, player2=self.new_player)
         await TradeObject.create(
             trade=trade, ballinstance=self.countryball, player=self.countryball.trade_player
@@ -118,11 +126,85 @@ class SortingChoices(enum.Enum):
     stats_bonus = "stats"
     total_stats = "total_stats"
 
-    # manual sorts are not sorted by SQL queries but by our code
-    # this may be do-able with SQL still, but I don't have much experience ngl
+    # sorted by the number of instances of the same ball, see DUPLICATES_SQL
     duplicates = "manualsort-duplicates"
 
 
+def stat_sql(stat: str) -> str:
+    """
+    SQL expression of an instance's stat with its bonus, computed like the `BallInstance`
+    properties (the integer division truncates towards zero like `int`).
+
+    This reads the ball table joined by `select_related("ball")`, under Tortoise's alias.
+    """
+    ball = '"ballinstance__ball"'
+    return f'({ball}."{stat}" + {ball}."{stat}" * "ballinstance"."{stat}_bonus" / 100)'
+
+
+# sorts on values computed by the database, sorted in descending order
+COMPUTED_SORTS = {
+    SortingChoices.stats_bonus: '"ballinstance"."health_bonus" + "ballinstance"."attack_bonus"',
+    SortingChoices.health: stat_sql("health"),
+    SortingChoices.attack: stat_sql("attack"),
+    SortingChoices.total_stats: f'{stat_sql("health")} + {stat_sql("attack")}',
+}
+# computed sorts reading the ball's stats, which need the ball table joined
+BALL_STAT_SORTS = {SortingChoices.health, SortingChoices.attack, SortingChoices.total_stats}
+# number of instances of the same ball, using the (player_id, ball_id) index
+DUPLICATES_SQL = (
+    '(SELECT COUNT(*) FROM "ballinstance" AS "duplicate" '
+    'WHERE "duplicate"."player_id" = "ballinstance"."player_id" '
+    'AND "duplicate"."ball_id" = "ballinstance"."ball_id"{special})'
+)
+
+
+def sorted_source(
+    queryset: QuerySet[BallInstance],
+    count: int,
+    sort: SortingChoices | None = None,
+    reverse: bool = False,
+    *,
+    special_filter: bool = False,
+) -> KeysetSource:
+    """
+    Return the pages of `/balls list`, sorted by the database.
+
+    Parameters
+    ----------
+    queryset: QuerySet[BallInstance]
+        The instances to list.
+    count: int
+        Number of instances in the queryset.
+    sort: SortingChoices | None
+        How to sort the instances, favorites and shinies first if `None`.
+    reverse: bool
+        Reverse the order.
+    special_filter: bool
+        Whether the queryset is filtered by special, to count duplicates with the same one.
+    """
+    if sort is None:
+        keys = [SortKey.parse("-favorite"), SortKey.parse("-shiny")]
+    elif sort == SortingChoices.duplicates:
+        same_special = ' AND "duplicate"."special_id" = "ballinstance"."special_id"'
+        duplicates = DUPLICATES_SQL.format(special=same_special if special_filter else "")
+        queryset = queryset.annotate(sort_value=RawSQL(duplicates))
+        keys = [SortKey("sort_value", descending=True), SortKey("ball_id")]
+    elif sort in COMPUTED_SORTS:
+        if sort in BALL_STAT_SORTS:
+            queryset = queryset.select_related("ball")
+        queryset = queryset.annotate(sort_value=RawSQL(COMPUTED_SORTS[sort]))
+        keys = [SortKey("sort_value", descending=True)]
+    elif sort == SortingChoices.rarity:
+        keys = [SortKey.parse(sort.value), SortKey.parse("ball__country")]
+    elif sort == SortingChoices.special:
+        keys = [SortKey("special_id", nullable=True)]
+    else:
+        keys = [SortKey.parse(sort.value)]
+    if reverse:
+        keys = [x.reverse() for x in keys]
+    return KeysetSource(queryset, keys, count)
+
+
 class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
     """
     View and manage your countryballs collection.
@@ -162,7 +244,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         await interaction.response.defer(thinking=True)
 
         try:
-            player = await Player.get(discord_id=user_obj.id)
+            player = await players.fetch(user_obj.id)
         except DoesNotExist:
             if user_obj == interaction.user:
                 await interaction.followup.send(
@@ -176,7 +258,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         if user is not None:
             if await inventory_privacy(self.bot, interaction, player, user_obj) is False:
                 return
-        interaction_player = await Player.get(discord_id=interaction.user.id)
+        interaction_player = await players.fetch(interaction.user.id)
 
         blocked = await player.is_blocked(interaction_player)
         if blocked:
@@ -185,36 +267,14 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
             )
             return
 
-        await player.fetch_related("balls")
-        filters = {"ball__id": countryball.pk} if countryball else {}
+        queryset = BallInstance.filter(player_id=player.pk)
+        if countryball:
+            queryset = queryset.filter(ball_id=countryball.pk)
         if special:
-            filters["special"] = special
-        if sort:
-            if sort == SortingChoices.duplicates:
-                countryballs = await player.balls.filter(**filters)
-                count = defaultdict(int)
-                for ball in countryballs:
-                    count[ball.countryball.pk] += 1
-                countryballs.sort(key=lambda m: (-count[m.countryball.pk], m.countryball.pk))
-            elif sort == SortingChoices.stats_bonus:
-                countryballs = await player.balls.filter(**filters)
-                countryballs.sort(key=lambda x: x.health_bonus + x.attack_bonus, reverse=True)
-            elif sort == SortingChoices.health or sort == SortingChoices.attack:
-                countryballs = await player.balls.filter(**filters)
-                countryballs.sort(key=lambda x: getattr(x, sort.value), reverse=True)
-            elif sort == SortingChoices.total_stats:
-                countryballs = await player.balls.filter(**filters)
-                countryballs.sort(key=lambda x: x.health + x.attack, reverse=True)
-            elif sort == SortingChoices.rarity:
-                countryballs = await player.balls.filter(**filters).order_by(
-                    sort.value, "ball__country"
-                )
-            else:
-                countryballs = await player.balls.filter(**filters).order_by(sort.value)
-        else:
-            countryballs = await player.balls.filter(**filters).order_by("-favorite", "-shiny")
+            queryset = queryset.filter(special_id=special.pk)
+        count = await queryset.count()
 
-        if len(countryballs) < 1:
+        if count < 1:
             ball_txt = countryball.country if countryball else ""
             special_txt = special if special else ""
             if user_obj == interaction.user:
@@ -228,10 +288,10 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
                     f"{special_txt}{ball_txt} {settings.plural_collectible_name} yet."
                 )
             return
-        if reverse:
-            countryballs.reverse()
 
-        paginator = CountryballsViewer(interaction, countryballs)
+        # only one page of instances is loaded at a time
+        source = sorted_source(queryset, count, sort, reverse, special_filter=special is not None)
+        paginator = CountryballsViewer(interaction, source)
         if user_obj == interaction.user:
             await paginator.start()
         else:
@@ -265,7 +325,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         extra_text = "shiny " if shiny else "" + f"{special.name} " if special else ""
         if user is not None:
             try:
-                player = await Player.get(discord_id=user_obj.id)
+                player = await players.fetch(user_obj.id)
             except DoesNotExist:
                 await interaction.followup.send(
                     f"{user_obj.name} doesn't have any "
@@ -273,7 +333,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
                 )
                 return
 
-            interaction_player = await Player.get(discord_id=interaction.user.id)
+            interaction_player = await players.fetch(interaction.user.id)
             blocked = await player.is_blocked(interaction_player)
             if blocked:
                 await interaction.followup.send(
@@ -418,7 +478,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         user_obj = user if user else interaction.user
         await interaction.response.defer(thinking=True)
         try:
-            player = await Player.get(discord_id=user_obj.id)
+            player = await players.fetch(user_obj.id)
         except DoesNotExist:
             msg = f"{'You do' if user is None else f'{user_obj.display_name} does'}"
             await interaction.followup.send(
@@ -431,7 +491,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
             if await inventory_privacy(self.bot, interaction, player, user_obj) is False:
                 return
 
-        interaction_player = await Player.get(discord_id=interaction.user.id)
+        interaction_player = await players.fetch(interaction.user.id)
         blocked = await player.is_blocked(interaction_player)
         if blocked:
             await interaction.followup.send(
@@ -576,7 +636,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         else:
             await interaction.response.defer()
         await countryball.lock_for_trade()
-        new_player, _ = await Player.get_or_create(discord_id=user.id)
+        new_player = await players.get_or_create(user.id)
         old_player = countryball.player
 
         if new_player == old_player:
@@ -629,6 +689,7 @@ class Balls(commands.GroupCog, group_name=settings.players_group_cog_name):
         countryball.trade_player = old_player
         countryball.favorite = False
         await countryball.save()
+        inventories.remove(countryball, old_player.pk)
 
         trade = await Trade.create(player1=old_player, player2=new_player)
         await TradeObject.create(trade=trade, ballinstance=countryball, player=old_player)
@@ -699,7 +760,7 @@ async def inventory_privacy(
     user_obj: Union[discord.User, discord.Member],
 ):
     privacy_policy = player.privacy_policy
-    interacting_player = await Player.get(discord_id=interaction.user.id)
+    interacting_player = await players.fetch(interaction.user.id)
     if interaction.user.id == player.discord_id:
         return True
     if interaction.guild and interaction.guild.id in settings.admin_guild_ids:
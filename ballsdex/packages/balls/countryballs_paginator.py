@@ -1,8 +1,13 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List
+import math
+from dataclasses import dataclass, replace
+from functools import reduce
+from typing import TYPE_CHECKING, Any, List
 
 import discord
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
 
 from ballsdex.core.models import BallInstance
 from ballsdex.core.utils import menus
@@ -11,20 +16,147 @@ from ballsdex.core.utils.paginator import Pages
 if TYPE_CHECKING:
     from ballsdex.core.bot import BallsDexBot
 
+PER_PAGE = 25
 
-class CountryballsSource(menus.ListPageSource):
-    def __init__(self, entries: List[BallInstance]):
-        super().__init__(entries, per_page=25)
+
+class SelectorPageMixin:
+    """
+    Displays pages of instances as the options of a `CountryballsSelector`.
+    """
 
     async def format_page(self, menu: CountryballsSelector, balls: List[BallInstance]):
         menu.set_options(balls)
         return True  # signal to edit the page
 
 
+class CountryballsSource(SelectorPageMixin, menus.ListPageSource):
+    def __init__(self, entries: List[BallInstance]):
+        super().__init__(entries, per_page=PER_PAGE)
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """
+    A column instances are sorted by.
+
+    Attributes
+    ----------
+    field: str
+        Name of the field or annotation, following relations with "__" like Tortoise filters.
+    descending: bool
+        Sort in descending order. PostgreSQL lists nulls last in ascending order and first in
+        descending order.
+    nullable: bool
+        Whether the field may be null.
+    """
+
+    field: str
+    descending: bool = False
+    nullable: bool = False
+
+    @classmethod
+    def parse(cls, order: str) -> SortKey:
+        """
+        Build a key from a Tortoise `order_by` argument, such as "-catch_date".
+        """
+        return cls(order.removeprefix("-"), descending=order.startswith("-"))
+
+    @property
+    def order(self) -> str:
+        return f"-{self.field}" if self.descending else self.field
+
+    def reverse(self) -> SortKey:
+        return replace(self, descending=not self.descending)
+
+    def value(self, instance: BallInstance) -> Any:
+        return reduce(getattr, self.field.split("__"), instance)
+
+    def equal(self, value: Any) -> Q:
+        if value is None:
+            return Q(**{f"{self.field}__isnull": True})
+        return Q(**{self.field: value})
+
+    def after(self, value: Any) -> Q | None:
+        """
+        Condition for a row to be sorted after the given value, or `None` if none can be.
+        """
+        if self.descending:
+            if value is None:
+                return Q(**{f"{self.field}__isnull": False})
+            return Q(**{f"{self.field}__lt": value})
+        if value is None:
+            return None
+        if self.nullable:
+            return Q(**{f"{self.field}__gt": value}) | Q(**{f"{self.field}__isnull": True})
+        return Q(**{f"{self.field}__gt": value})
+
+
+class KeysetSource(SelectorPageMixin, menus.PageSource):
+    """
+    Pages of instances fetched one at a time from the database, only keeping the sort keys of
+    the last instance of each page seen.
+
+    The page following a known page is fetched with keyset pagination: rows sorted after the
+    last one of that page, which stays fast however far the page is. Jumping to an unvisited
+    page falls back to an offset.
+
+    Attributes
+    ----------
+    queryset: QuerySet[BallInstance]
+        The filtered instances, unsorted, annotated with the computed values sorted by.
+    keys: list[SortKey]
+        Keys the instances are sorted by, the ID is added to break ties.
+    count: int
+        Total number of instances, used to know the number of pages.
+    """
+
+    def __init__(self, queryset: QuerySet[BallInstance], keys: List[SortKey], count: int):
+        self.queryset = queryset
+        self.keys = [*keys, SortKey("id", descending=keys[-1].descending if keys else False)]
+        self.count = count
+        self.per_page = PER_PAGE
+        self._cursors: dict[int, tuple[Any, ...]] = {}
+        self._related = sorted({x.field.split("__")[0] for x in self.keys if "__" in x.field})
+
+    def is_paginating(self) -> bool:
+        return self.count > self.per_page
+
+    def get_max_pages(self) -> int:
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def after(self, cursor: tuple[Any, ...]) -> Q:
+        # (a, b, c) > (x, y, z) with mixed directions and nulls: a > x, or a = x and b > y...
+        conditions: list[Q] = []
+        for i, (key, value) in enumerate(zip(self.keys, cursor)):
+            if (after := key.after(value)) is None:
+                continue
+            equal = [x.equal(y) for x, y in zip(self.keys[:i], cursor[:i])]
+            conditions.append(Q(*equal, after))
+        return Q(*conditions, join_type=Q.OR)
+
+    async def get_page(self, page_number: int) -> List[BallInstance]:
+        queryset = self.queryset.order_by(*(x.order for x in self.keys))
+        if self._related:
+            queryset = queryset.select_related(*self._related)
+        if page_number > 0:
+            if (cursor := self._cursors.get(page_number - 1)) is not None:
+                queryset = queryset.filter(self.after(cursor))
+            else:
+                queryset = queryset.offset(page_number * self.per_page)
+        page = await queryset.limit(self.per_page)
+        if page:
+            self._cursors[page_number] = tuple(x.value(page[-1]) for x in self.keys)
+        return page
+
+
 class CountryballsSelector(Pages):
-    def __init__(self, interaction: discord.Interaction["BallsDexBot"], balls: List[BallInstance]):
+    def __init__(
+        self,
+        interaction: discord.Interaction["BallsDexBot"],
+        balls: List[BallInstance] | menus.PageSource,
+    ):
         self.bot = interaction.client
-        source = CountryballsSource(balls)
+        source = balls if isinstance(balls, menus.PageSource) else CountryballsSource(balls)
         super().__init__(source, interaction=interaction)
         self.add_item(self.select_ball_menu)
 
@@ -63,6 +195,7 @@ class CountryballsSelector(Pages):
 
 class CountryballsViewer(CountryballsSelector):
     async def ball_selected(self, interaction: discord.Interaction, ball_instance: BallInstance):
+        # RenderPoolBusy is handled by Pages.on_error
         content, file = await ball_instance.prepare_for_message(interaction)
         await interaction.followup.send(content=content, file=file)
         file.close()
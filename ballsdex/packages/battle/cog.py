@@ -14,7 +14,7 @@ import io
 from ballsdex.core.models import (
     Ball,
     BallInstance,
-    Player
+    players
 )
 from ballsdex.core.models import balls as countryballs
 from ballsdex.settings import settings
@@ -528,7 +528,7 @@ class Battle(commands.GroupCog):
         countryball: Ball
             The countryball you want to add.
         """
-        player, _ = await Player.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         balls = await countryball.ballinstances.filter(player=player)
 
         count = 0
@@ -548,7 +548,7 @@ class Battle(commands.GroupCog):
         """
         Adds all your countryballs to a battle.
         """
-        player, _ = await Player.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         balls = await BallInstance.filter(player=player)
 
         count = 0
@@ -567,7 +567,7 @@ class Battle(commands.GroupCog):
         """
         Removes all your countryballs from a battle.
         """
-        player, _ = await Player.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         balls = await BallInstance.filter(player=player)
 
         count = 0
@@ -591,7 +591,7 @@ class Battle(commands.GroupCog):
         countryball: Ball
             The countryball you want to remove.
         """
-        player, _ = await Player.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         balls = await countryball.ballinstances.filter(player=player)
 
         count = 0
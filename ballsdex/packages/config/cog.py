@@ -4,7 +4,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from ballsdex.core.models import GuildConfig
+from ballsdex.core.models import guild_configs
 from ballsdex.packages.config.components import AcceptTOSView
 from ballsdex.settings import settings
 
@@ -85,10 +85,11 @@ class Config(commands.GroupCog):
         Disable or enable countryballs spawning.
         """
         guild = cast(discord.Guild, interaction.guild)  # guild-only command
-        config, created = await GuildConfig.get_or_create(guild_id=interaction.guild_id)
+        config = await guild_configs.get_or_create(guild.id)
         if config.enabled:
             config.enabled = False  # type: ignore
             await config.save()
+            guild_configs.set(config)
             self.bot.dispatch("ballsdex_settings_change", guild, enabled=False)
             await interaction.response.send_message(
                 f"{settings.bot_name} is now disabled in this server. Commands will still be "
@@ -98,6 +99,7 @@ class Config(commands.GroupCog):
         else:
             config.enabled = True  # type: ignore
             await config.save()
+            guild_configs.set(config)
             self.bot.dispatch("ballsdex_settings_change", guild, enabled=True)
             if config.spawn_channel and (channel := guild.get_channel(config.spawn_channel)):
                 if channel:
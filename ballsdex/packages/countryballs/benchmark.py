@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from ballsdex.core.utils.sampler import WeightedSampler
+
+
+# duck-typed stand-in for Ball, only holding what the spawn draw reads
+@dataclass
+class SyntheticBall:
+    pk: int
+    rarity: float
+    enabled: bool = True
+
+
+def generate_balls(n: int, rng: random.Random) -> dict[int, SyntheticBall]:
+    return {
+        i: SyntheticBall(i, round(rng.uniform(0.1, 10), 2), enabled=rng.random() > 0.1)
+        for i in range(n)
+    }
+
+
+def draw_choices(balls: dict[int, SyntheticBall], k: int) -> list[SyntheticBall]:
+    # what CountryBall.get_random used to do, once per drawn ball
+    result: list[SyntheticBall] = []
+    for _ in range(k):
+        countryballs = list(filter(lambda m: m.enabled, balls.values()))
+        rarities = [x.rarity for x in countryballs]
+        result.append(random.choices(population=countryballs, weights=rarities, k=1)[0])
+    return result
+
+
+def timeit(func: Callable[[], object], iterations: int) -> float:
+    t1 = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - t1) / iterations
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}µs"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+def bench_sampler(sizes: list[int], iterations: int, bomb: int) -> Table:
+    """
+    Compare drawing random balls with `random.choices` on the filtered list against the
+    precomputed alias tables, for a single spawn and a spawn bomb.
+    """
+    rng = random.Random(0)
+    table = Table(box=box.SIMPLE, title="Weighted spawn draw")
+    table.add_column("Balls", justify="right", style="cyan")
+    table.add_column("Draw", style="cyan")
+    table.add_column("random.choices", justify="right")
+    table.add_column("Sampler", justify="right", style="green")
+    table.add_column("Speedup", justify="right", style="green")
+    for size in sizes:
+        balls = generate_balls(size, rng)
+        t1 = time.perf_counter()
+        sampler = WeightedSampler(
+            (x for x in balls.values() if x.enabled), lambda x: x.rarity  # type: ignore
+        )
+        build = time.perf_counter() - t1
+        for name, k in (("1 ball", 1), (f"{bomb} balls", bomb)):
+            old = timeit(lambda: draw_choices(balls, k), max(1, iterations // k))
+            new = timeit(lambda: sampler.sample(k), max(1, iterations // k))
+            table.add_row(str(size), name, format_time(old), format_time(new), f"x{old / new:.0f}")
+        table.add_row(str(size), "Build", "", format_time(build), "")
+    return table
+
+
+def check_distribution(size: int, draws: int) -> Table:
+    """
+    Compare the frequency of each ball drawn by the sampler with its expected probability.
+    """
+    balls = generate_balls(size, random.Random(0))
+    sampler = WeightedSampler((x for x in balls.values() if x.enabled), lambda x: x.rarity)
+    counts = dict.fromkeys(balls, 0)
+    for ball in sampler.sample(draws):
+        counts[ball.pk] += 1
+    errors = [
+        abs(counts[x.pk] / draws - x.rarity / sampler.total) * sampler.total / x.rarity
+        for x in sampler.items
+    ]
+    disabled = sum(counts[x.pk] for x in balls.values() if not x.enabled)
+
+    table = Table(box=box.SIMPLE, title=f"Distribution over {draws} draws of {size} balls")
+    table.add_column("Mean relative error", justify="right", style="green")
+    table.add_column("Max relative error", justify="right")
+    table.add_column("Disabled drawn", justify="right", style="green")
+    table.add_row(f"{sum(errors) / len(errors):.2%}", f"{max(errors):.2%}", str(disabled))
+    return table
+
+
+async def bench_catch(database: str, iterations: int) -> Table:
+    """
+    Compare the latency of a successful catch with the previous sequence of queries and with
+    `BallInstance.catch`. Players and a guild config are created then deleted, use a database
+    that can be written to.
+    """
+    from tortoise import Tortoise
+    from tortoise.exceptions import DoesNotExist
+
+    from ballsdex.core.models import Ball, BallInstance, GuildConfig, Player
+
+    guild_id = 10**17
+    discord_ids = [10**17 + i for i in range(20)]
+
+    async def separate_queries(discord_id: int, ball: Ball):
+        # what the catch modal used to do: players and configs fetched by on_submit, then
+        # the player again, the completion check and the insert by catch_ball
+        player, _ = await Player.get_or_create(discord_id=discord_id)
+        try:
+            await GuildConfig.get(guild_id=guild_id)
+        except DoesNotExist:
+            await GuildConfig.create(guild_id=guild_id, spawn_channel=None)
+        player, _ = await Player.get_or_create(discord_id=discord_id)
+        await BallInstance.filter(player=player, ball=ball).exists()
+        await BallInstance.create(ball=ball, player=player, server_id=guild_id)
+
+    async def transaction(discord_id: int, ball: Ball):
+        await BallInstance.catch(discord_id, ball, server_id=guild_id)
+
+    await Tortoise.init(db_url=database, modules={"models": ["ballsdex.core.models"]})
+    table = Table(box=box.SIMPLE, title="Catch latency")
+    table.add_column("Path", style="cyan")
+    table.add_column("New players", justify="right")
+    table.add_column("p50", justify="right", style="green")
+    table.add_column("p99", justify="right")
+    try:
+        ball = await Ball.first()
+        if ball is None:
+            raise RuntimeError("The database needs at least one ball")
+        for name, func in (
+            ("Separate queries", separate_queries),
+            ("BallInstance.catch", transaction),
+        ):
+            await Player.filter(discord_id__in=discord_ids).delete()
+            times: list[float] = []
+            for i in range(iterations):
+                t1 = time.perf_counter()
+                await func(discord_ids[i % len(discord_ids)], ball)
+                times.append(time.perf_counter() - t1)
+            percentiles = statistics.quantiles(times, n=100, method="inclusive")
+            table.add_row(
+                name,
+                str(min(iterations, len(discord_ids))),
+                format_time(statistics.median(times)),
+                format_time(percentiles[98]),
+            )
+    finally:
+        await Player.filter(discord_id__in=discord_ids).delete()
+        await GuildConfig.filter(guild_id=guild_id).delete()
+        await Tortoise.close_connections()
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m ballsdex.packages.countryballs.benchmark",
+        description="Measure the performance of the spawn system",
+    )
+    parser.add_argument(
+        "--iterations", "-n", type=int, default=1000, help="Number of draws of each measure"
+    )
+    parser.add_argument(
+        "--balls",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+        help="Number of synthetic balls to draw from",
+    )
+    parser.add_argument("--bomb", type=int, default=100, help="Size of the spawn bomb")
+    parser.add_argument(
+        "--database",
+        help="URL of a PostgreSQL database to also measure catches against, rows are created "
+        "then deleted. Do not use the production database",
+    )
+    parser.add_argument("--catches", type=int, default=200, help="Number of catches per measure")
+    args = parser.parse_args()
+
+    console = Console()
+    console.print(bench_sampler(args.balls, args.iterations, args.bomb))
+    console.print(check_distribution(100, 1_000_000))
+    if args.database:
+        console.print(asyncio.run(bench_catch(args.database, args.catches)))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,8 @@ from typing import TYPE_CHECKING, Optional
 
 import discord
 from discord.ext import commands
-from tortoise.exceptions import DoesNotExist
 
-from ballsdex.core.models import GuildConfig
+from ballsdex.core.models import GuildConfig, guild_configs
 from ballsdex.packages.countryballs.spawn import SpawnManager
 
 if TYPE_CHECKING:
@@ -19,6 +18,9 @@ class CountryBallsSpawner(commands.Cog):
         self.spawn_manager = SpawnManager()
         self.bot = bot
 
+    async def cog_unload(self):
+        self.spawn_manager.queue.stop()
+
     async def load_cache(self):
         i = 0
         async for config in GuildConfig.all():
@@ -27,6 +29,7 @@ class CountryBallsSpawner(commands.Cog):
             if not config.spawn_channel:
                 continue
             self.spawn_manager.cache[config.guild_id] = config.spawn_channel
+            guild_configs.set(config)
             i += 1
         grammar = "" if i == 1 else "s"
         log.info(f"Loaded {i} guild{grammar} in cache.")
@@ -57,11 +60,8 @@ class CountryBallsSpawner(commands.Cog):
             if channel:
                 self.spawn_manager.cache[guild.id] = channel.id
             else:
-                try:
-                    config = await GuildConfig.get(guild_id=guild.id)
-                except DoesNotExist:
-                    return
-                else:
+                config = await guild_configs.get(guild.id)
+                if config and config.spawn_channel:
                     self.spawn_manager.cache[guild.id] = config.spawn_channel
         else:
             if enabled is False:
@@ -8,15 +8,20 @@ from typing import TYPE_CHECKING, cast
 import discord
 from discord.ui import Button, Modal, TextInput, View
 from prometheus_client import Counter
-from tortoise.exceptions import DoesNotExist
 from tortoise.timezone import now as datetime_now
 
-from ballsdex.core.models import BallInstance, GuildConfig, Player, specials
+from ballsdex.core.models import (
+    BallInstance,
+    catch_names,
+    guild_configs,
+    players,
+    special_schedule,
+)
 from ballsdex.settings import settings
 
 if TYPE_CHECKING:
     from ballsdex.core.bot import BallsDexBot
-    from ballsdex.core.models import Special
+    from ballsdex.core.models import Player, Special
     from ballsdex.packages.countryballs.countryball import CountryBall
 
 log = logging.getLogger("ballsdex.packages.countryballs.components")
@@ -38,10 +43,7 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
         self.button = button
 
     async def on_error(self, interaction: discord.Interaction, error: Exception, /) -> None:
-        try:
-            config = await GuildConfig.get(guild_id=interaction.guild_id)
-        except DoesNotExist:
-            config = await GuildConfig.create(guild_id=interaction.guild_id, spawn_channel=None)
+        config = await guild_configs.get_or_create(interaction.guild_id)  # type: ignore
         log.exception("An error occured in countryball catching prompt", exc_info=error)
         if interaction.response.is_done():
             await interaction.followup.send(
@@ -55,32 +57,11 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
             )
 
     async def on_submit(self, interaction: discord.Interaction["BallsDexBot"]):
-        # TODO: use lock
-        player, created = await Player.get_or_create(discord_id=interaction.user.id)
-        try:
-            config = await GuildConfig.get(guild_id=interaction.guild_id)
-        except DoesNotExist:
-            config = await GuildConfig.create(guild_id=interaction.guild_id, spawn_channel=None)
-
-        if self.ball.catched:
-            await interaction.response.send_message(
-                f"{interaction.user.mention} I was caught already!",
-                ephemeral=config.silent,
-                allowed_mentions=discord.AllowedMentions(users=player.can_be_mentioned),
-            )
-            return
-
-        if self.ball.model.catch_names:
-            possible_names = (self.ball.name.lower(), *self.ball.model.catch_names.split(";"))
-        else:
-            possible_names = (self.ball.name.lower(),)
-        if self.ball.model.translations:
-            possible_names += tuple(x.lower() for x in self.ball.model.translations.split(";"))
-
-        if self.name.value.lower().strip() in possible_names:
+        if not self.ball.catched and catch_names.matches(self.name.value, self.ball.model):
+            # set before any await, two users can't catch the same ball
             self.ball.catched = True
             await interaction.response.defer(thinking=True)
-            ball, has_caught_before = await self.catch_ball(
+            ball, player, has_caught_before = await self.catch_ball(
                 interaction.client, cast(discord.Member, interaction.user)
             )
 
@@ -102,6 +83,17 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
             )
             self.button.disabled = True
             await interaction.followup.edit_message(self.ball.message.id, view=self.button.view)
+            return
+
+        player = await players.get_or_create(interaction.user.id)
+        config = await guild_configs.get_or_create(interaction.guild_id)  # type: ignore
+
+        if self.ball.catched:
+            await interaction.response.send_message(
+                f"{interaction.user.mention} I was caught already!",
+                ephemeral=config.silent,
+                allowed_mentions=discord.AllowedMentions(users=player.can_be_mentioned),
+            )
         else:
             await interaction.response.send_message(
                 f"{interaction.user.mention} Wrong name!",
@@ -111,9 +103,7 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
 
     async def catch_ball(
         self, bot: "BallsDexBot", user: discord.Member
-    ) -> tuple[BallInstance, bool]:
-        player, created = await Player.get_or_create(discord_id=user.id)
-
+    ) -> tuple[BallInstance, Player, bool]:
         # stat may vary by +/- 20% of base stat
         bonus_attack = random.randint(-settings.max_attack_bonus, settings.max_attack_bonus)
         bonus_health = random.randint(-settings.max_health_bonus, settings.max_health_bonus)
@@ -121,23 +111,12 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
 
         # check if we can spawn cards with a special background
         special: "Special | None" = None
-        population = [x for x in specials.values() if x.start_date <= datetime_now() <= x.end_date]
-        if not shiny and population:
-            # Here we try to determine what should be the chance of having a common card
-            # since the rarity field is a value between 0 and 1, 1 being no common
-            # and 0 only common, we get the remaining value by doing (1-rarity)
-            # We then sum each value for each current event, and we should get an algorithm
-            # that kinda makes sense.
-            common_weight = sum(1 - x.rarity for x in population)
-
-            weights = [x.rarity for x in population] + [common_weight]
-            # None is added representing the common countryball
-            special = random.choices(population=population + [None], weights=weights, k=1)[0]
-
-        is_new = not await BallInstance.filter(player=player, ball=self.ball.model).exists()
-        ball = await BallInstance.create(
-            ball=self.ball.model,
-            player=player,
+        if not shiny:
+            special = special_schedule.pick(datetime_now())
+
+        ball, player, is_new = await BallInstance.catch(
+            user.id,
+            self.ball.model,
             shiny=shiny,
             special=special,
             attack_bonus=bonus_attack,
@@ -163,7 +142,7 @@ class CountryballNamePrompt(Modal, title=f"Catch this {settings.collectible_name
                 # observe the size of the server, rounded to the nearest power of 10
                 guild_size=10 ** math.ceil(math.log(max(user.guild.member_count - 1, 1), 10)),
             ).inc()
-        return ball, is_new
+        return ball, player, is_new
 
 
 class CatchButton(Button):
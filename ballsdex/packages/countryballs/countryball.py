@@ -1,15 +1,53 @@
 import logging
+import os
 import random
 import string
 from datetime import datetime
+from io import BytesIO
 
 import discord
+from cachetools import LRUCache
+from prometheus_client import Counter
 
-from ballsdex.core.models import Ball, balls
+from ballsdex.core.models import Ball, ball_sampler
 from ballsdex.packages.countryballs.components import CatchView
 from ballsdex.settings import settings
 
 log = logging.getLogger("ballsdex.packages.countryballs")
+wild_card_lookups = Counter(
+    "wild_card_cache_lookups", "Lookups of spawn artworks in the memory cache", ["result"]
+)
+wild_card_bytes = Counter("wild_card_cache_bytes", "Bytes of spawn artworks served from memory")
+spawn_rate_limited = Counter(
+    "spawn_rate_limited", "Spawns that failed because Discord kept answering with HTTP 429"
+)
+
+WILD_CARD_CACHE_SIZE = 64 * 1024 * 1024
+# raw file contents keyed by (path, modification time), replaced files are read again
+wild_cards: LRUCache[tuple[str, int], bytes] = LRUCache(WILD_CARD_CACHE_SIZE, getsizeof=len)
+
+
+def get_wild_card(path: str) -> BytesIO:
+    """
+    Return the contents of a spawn artwork, reading the file only if not cached.
+
+    The returned buffer shares the cached bytes (`BytesIO` only copies them when written), so
+    each spawn can consume and close its own buffer.
+    """
+    key = (path, os.stat(path).st_mtime_ns)
+    data = wild_cards.get(key)
+    if data is None:
+        wild_card_lookups.labels(result="miss").inc()
+        with open(path, "rb") as file:
+            data = file.read()
+        try:
+            wild_cards[key] = data
+        except ValueError:  # larger than the whole cache
+            pass
+    else:
+        wild_card_lookups.labels(result="hit").inc()
+        wild_card_bytes.inc(len(data))
+    return BytesIO(data)
 
 
 class CountryBall:
@@ -23,12 +61,16 @@ class CountryBall:
 
     @classmethod
     async def get_random(cls):
-        countryballs = list(filter(lambda m: m.enabled, balls.values()))
-        if not countryballs:
+        return (await cls.get_random_many(1))[0]
+
+    @classmethod
+    async def get_random_many(cls, k: int) -> list["CountryBall"]:
+        """
+        Draw `k` random enabled countryballs at once, weighted by their rarity.
+        """
+        if not ball_sampler:
             raise RuntimeError("No ball to spawn")
-        rarities = [x.rarity for x in countryballs]
-        cb = random.choices(population=countryballs, weights=rarities, k=1)[0]
-        return cls(cb)
+        return [cls(x) for x in ball_sampler.sample(k)]
 
     async def spawn(self, channel: discord.TextChannel) -> bool:
         """
@@ -60,13 +102,15 @@ class CountryBall:
                 self.message = await channel.send(
                     f"A wild {settings.collectible_name} appeared!",
                     view=CatchView(self),
-                    file=discord.File(file_location, filename=file_name),
+                    file=discord.File(get_wild_card(file_location), filename=file_name),
                 )
                 return True
             else:
                 log.error("Missing permission to spawn ball in channel %s.", channel)
         except discord.Forbidden:
             log.error(f"Missing permission to spawn ball in channel {channel}.")
-        except discord.HTTPException:
+        except discord.HTTPException as e:
+            if e.status == 429:
+                spawn_rate_limited.inc()
             log.error("Failed to spawn ball", exc_info=True)
         return False
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import csv
+import heapq
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator
+
+import discord
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from ballsdex.packages.countryballs import spawn
+from ballsdex.packages.countryballs.spawn import SpawnManager
+from ballsdex.settings import settings
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+# duck-typed stand-ins for the discord objects, only holding what the spawn manager reads
+@dataclass
+class SyntheticGuild:
+    id: int
+    member_count: int
+
+
+@dataclass
+class SyntheticMember:
+    id: int
+
+
+@dataclass
+class SyntheticMessage:
+    guild: SyntheticGuild
+    author: SyntheticMember
+    content: str
+    created_at: datetime
+
+
+@dataclass
+class GuildProfile:
+    """
+    Activity of a category of synthetic guilds.
+
+    Attributes
+    ----------
+    name: str
+        Name displayed in the report.
+    member_count: int
+        Number of members of the guilds.
+    messages_per_hour: float
+        Average number of messages, sent at random intervals.
+    chatters: int
+        Number of members sending messages, some talking much more than others.
+    """
+
+    name: str
+    member_count: int
+    messages_per_hour: float
+    chatters: int
+
+
+# same thresholds as the time-based multiplier of the spawn manager
+SIZE_CATEGORIES = [(5, "1-4 members"), (100, "5-99 members"), (1000, "100-999 members")]
+PROFILES = [
+    GuildProfile("1-4 members", 3, 20, 2),
+    GuildProfile("5-99 members", 50, 120, 8),
+    GuildProfile("100-999 members", 500, 600, 30),
+    GuildProfile("1000+ members", 5000, 3000, 150),
+]
+
+
+class VirtualClock:
+    """
+    Replaces `time.monotonic` in the spawn module while used as a context manager, so that
+    hours of messages are replayed in seconds while cooldowns and idle eviction behave as they
+    would live.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._monotonic = spawn.monotonic
+
+    def __call__(self) -> float:
+        return self.now
+
+    def __enter__(self) -> "VirtualClock":
+        self._monotonic = spawn.monotonic
+        spawn.monotonic = self  # type: ignore
+        return self
+
+    def __exit__(self, *args):
+        spawn.monotonic = self._monotonic
+
+
+@dataclass
+class SimulatedSpawnManager(SpawnManager):
+    """
+    The real spawn manager, counting spawns and evicted guilds instead of sending them.
+    """
+
+    spawns: Counter[int] = field(default_factory=Counter)
+    evicted: int = 0
+
+    def evict_idle(self):
+        count = len(self.cooldowns)
+        super().evict_idle()
+        self.evicted += count - len(self.cooldowns)
+
+    async def spawn_countryball(self, guild: discord.Guild):
+        self.spawns[guild.id] += 1
+
+
+def size_category(member_count: int) -> str:
+    for limit, name in SIZE_CATEGORIES:
+        if member_count < limit:
+            return name
+    return "1000+ members"
+
+
+def generate_messages(
+    profiles: list[GuildProfile], guilds: int, hours: float, seed: int
+) -> Iterator[tuple[float, SyntheticMessage]]:
+    """
+    Yield synthetic messages of `guilds` guilds per profile in chronological order, with
+    exponentially distributed intervals and a few chatters sending most of the messages.
+    """
+    rng = random.Random(seed)
+    end = hours * 3600
+    queue: list[tuple[float, int]] = []
+    setups: list[tuple[GuildProfile, SyntheticGuild, list[SyntheticMember], list[float]]] = []
+    for profile in profiles:
+        for _ in range(guilds):
+            guild = SyntheticGuild(len(setups) + 1, profile.member_count)
+            members = [SyntheticMember(guild.id * 10_000 + i) for i in range(profile.chatters)]
+            weights = [1 / (i + 1) for i in range(profile.chatters)]
+            setups.append((profile, guild, members, weights))
+            delay = rng.expovariate(profile.messages_per_hour / 3600)
+            heapq.heappush(queue, (delay, len(setups) - 1))
+
+    while queue:
+        now, index = heapq.heappop(queue)
+        if now > end:
+            continue
+        profile, guild, members, weights = setups[index]
+        author = rng.choices(members, weights)[0]
+        content = "x" * int(rng.lognormvariate(3, 1))
+        yield now, SyntheticMessage(guild, author, content, START + timedelta(seconds=now))
+        heapq.heappush(queue, (now + rng.expovariate(profile.messages_per_hour / 3600), index))
+
+
+def read_messages(path: Path) -> Iterator[tuple[float, SyntheticMessage]]:
+    """
+    Yield the messages recorded in a CSV file, sorted by time, with the columns `time` (in
+    seconds from the start), `guild_id`, `member_count`, `author_id` and `length`.
+    """
+    guilds: dict[int, SyntheticGuild] = {}
+    with path.open(newline="") as file:
+        rows = sorted(csv.DictReader(file), key=lambda x: float(x["time"]))
+    for row in rows:
+        guild_id = int(row["guild_id"])
+        guild = guilds.setdefault(guild_id, SyntheticGuild(guild_id, int(row["member_count"])))
+        now = float(row["time"])
+        yield now, SyntheticMessage(
+            guild,
+            SyntheticMember(int(row["author_id"])),
+            "x" * int(row["length"]),
+            START + timedelta(seconds=now),
+        )
+
+
+async def simulate(messages: Iterator[tuple[float, SyntheticMessage]], idle_ttl: int) -> Table:
+    """
+    Replay the messages through the spawn manager and report the spawn rates.
+    """
+    with VirtualClock() as clock:
+        manager = SimulatedSpawnManager(idle_ttl=idle_ttl)
+        guilds: dict[int, SyntheticGuild] = {}
+        counts: Counter[int] = Counter()
+        elapsed = 0.0
+        duration = 0.0
+        for now, message in messages:
+            clock.now = duration = now
+            guilds[message.guild.id] = message.guild
+            counts[message.guild.id] += 1
+            t1 = time.perf_counter()
+            await manager.handle_message(message)  # type: ignore
+            elapsed += time.perf_counter() - t1
+
+    hours = max(duration, 1) / 3600
+    categories: dict[str, list[int]] = {}
+    for guild in guilds.values():
+        categories.setdefault(size_category(guild.member_count), []).append(guild.id)
+
+    total = sum(counts.values())
+    table = Table(
+        box=box.SIMPLE,
+        title=f"Spawns over {hours:.1f} hours",
+        caption=f"{total} messages processed at {total / (elapsed or 1):,.0f} messages/s, "
+        f"{manager.evicted} idle guild states dropped",
+    )
+    table.add_column("Guild size", style="cyan")
+    table.add_column("Guilds", justify="right")
+    table.add_column("Messages/h", justify="right")
+    table.add_column("Spawns/h", justify="right", style="green")
+    table.add_column("Messages/spawn", justify="right", style="green")
+    for name in [x for _, x in SIZE_CATEGORIES] + ["1000+ members"]:
+        if not (ids := categories.get(name)):
+            continue
+        messages_count = sum(counts[x] for x in ids)
+        spawns = sum(manager.spawns[x] for x in ids)
+        table.add_row(
+            name,
+            str(len(ids)),
+            f"{messages_count / len(ids) / hours:.1f}",
+            f"{spawns / len(ids) / hours:.2f}",
+            f"{messages_count / spawns:.0f}" if spawns else "-",
+        )
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m ballsdex.packages.countryballs.simulator",
+        description="Replay message streams through the spawn manager with a virtual clock",
+    )
+    parser.add_argument(
+        "--replay",
+        type=Path,
+        help="CSV file of recorded messages (time, guild_id, member_count, author_id, length) "
+        "to replay instead of synthetic guilds",
+    )
+    parser.add_argument("--guilds", type=int, default=20, help="Synthetic guilds per size")
+    parser.add_argument("--hours", type=float, default=24, help="Duration of the simulation")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic messages")
+    parser.add_argument(
+        "--chance-range",
+        type=int,
+        nargs=2,
+        default=spawn.SPAWN_CHANCE_RANGE,
+        metavar=("MIN", "MAX"),
+        help="Override the range of points to reach before spawning",
+    )
+    parser.add_argument(
+        "--cooldown",
+        type=float,
+        default=spawn.MESSAGE_COOLDOWN,
+        help="Override the number of seconds between two counted messages",
+    )
+    parser.add_argument(
+        "--idle-ttl",
+        type=int,
+        default=settings.spawn_idle_ttl,
+        help="Number of seconds without messages after which a guild's state is dropped, "
+        "0 to keep them forever",
+    )
+    args = parser.parse_args()
+
+    spawn.SPAWN_CHANCE_RANGE = tuple(args.chance_range)
+    spawn.MESSAGE_COOLDOWN = args.cooldown
+    if args.replay:
+        messages = read_messages(args.replay)
+    else:
+        messages = generate_messages(PROFILES, args.guilds, args.hours, args.seed)
+
+    console = Console()
+    with console.status("Simulating..."):
+        table = asyncio.run(simulate(messages, args.idle_ttl))
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
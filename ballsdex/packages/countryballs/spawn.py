@@ -1,23 +1,115 @@
 import asyncio
 import logging
 import random
-from collections import deque, namedtuple
+import sys
+from array import array
+from collections import Counter, deque, namedtuple
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import cast
+from time import monotonic
+from typing import Iterator, cast
 
 import discord
+from prometheus_client import Gauge, Histogram
 
 from ballsdex.packages.countryballs.countryball import CountryBall
+from ballsdex.settings import settings
 
 log = logging.getLogger("ballsdex.packages.countryballs")
+spawn_guilds = Gauge("spawn_manager_guilds", "Guilds with a spawn state kept in memory")
+spawn_guild_memory = Gauge(
+    "spawn_manager_guild_memory", "Average memory used by the spawn state of a guild, in bytes"
+)
+spawn_queue_size = Gauge("spawn_queue_size", "Spawns waiting to be sent or being sent")
+spawn_queue_wait = Histogram(
+    "spawn_queue_wait",
+    "Time between a spawn being decided and a worker starting to send it",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf")),
+)
 
 SPAWN_CHANCE_RANGE = (40, 55)
+# minimum number of seconds between two messages counted for a guild
+MESSAGE_COOLDOWN = 10
+# number of seconds between two checks for idle guilds
+SWEEP_INTERVAL = 300
 
-CachedMessage = namedtuple("CachedMessage", ["content", "author_id"])
+CachedMessage = namedtuple("CachedMessage", ["length", "author_id"])
 
 
-@dataclass
+class MessageCache:
+    """
+    Ring buffer of the most recent messages of a guild, with running statistics about their
+    authors updated as messages are added and evicted.
+
+    Only the author ID and the length of the content (capped to 255) are kept, in arrays
+    growing up to `maxlen` entries then reused in place.
+
+    Attributes
+    ----------
+    maxlen: int
+        Maximum number of messages kept, the oldest ones are evicted first.
+    authors: ~collections.Counter[int]
+        Number of cached messages per author ID. Authors with no message left are removed.
+    short_messages: int
+        Number of cached messages shorter than 5 characters.
+    """
+
+    __slots__ = ("maxlen", "authors", "short_messages", "_author_ids", "_lengths", "_start")
+
+    def __init__(self, maxlen: int = 100):
+        self.maxlen = maxlen
+        self.authors: Counter[int] = Counter()
+        self.short_messages = 0
+        self._author_ids = array("Q")
+        self._lengths = array("B")
+        self._start = 0  # index of the oldest message once the buffer is full
+
+    def __len__(self) -> int:
+        return len(self._author_ids)
+
+    def __iter__(self) -> Iterator[CachedMessage]:
+        n = len(self._author_ids)
+        for j in range(n):
+            i = (self._start + j) % n
+            yield CachedMessage(length=self._lengths[i], author_id=self._author_ids[i])
+
+    def __sizeof__(self) -> int:
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self.authors)
+            + sys.getsizeof(self._author_ids)
+            + sys.getsizeof(self._lengths)
+        )
+
+    def append(self, message: CachedMessage):
+        length = min(message.length, 255)
+        if len(self._author_ids) < self.maxlen:
+            self._author_ids.append(message.author_id)
+            self._lengths.append(length)
+        else:
+            i = self._start
+            evicted = self._author_ids[i]
+            self.authors[evicted] -= 1
+            if not self.authors[evicted]:
+                del self.authors[evicted]
+            if self._lengths[i] < 5:
+                self.short_messages -= 1
+            self._author_ids[i] = message.author_id
+            self._lengths[i] = length
+            self._start = (i + 1) % self.maxlen
+        self.authors[message.author_id] += 1
+        if length < 5:
+            self.short_messages += 1
+
+    @property
+    def chatters(self) -> int:
+        """
+        Number of distinct authors in the cache.
+        """
+        return len(self.authors)
+
+
+@dataclass(slots=True)
 class SpawnCooldown:
     """
     Represents the spawn internal system per guild. Contains the counters that will determine
@@ -32,10 +124,13 @@ class SpawnCooldown:
         point, a ball will be spawned next.
     chance: int
         The number `amount` has to reach for spawn. Determined randomly with `SPAWN_CHANCE_RANGE`
-    lock: asyncio.Lock
-        Used to ratelimit messages and ignore fast spam
-    message_cache: ~collections.deque[CachedMessage]
-        A list of recent messages used to reduce the spawn chance when too few different chatters
+    counted_at: float | None
+        Monotonic time of the last counted message, used to ratelimit messages and ignore fast
+        spam. `None` if no message was counted since the last spawn.
+    last_message: float
+        Monotonic time of the last message received, counted or not. Used to forget idle guilds.
+    message_cache: MessageCache
+        The recent messages used to reduce the spawn chance when too few different chatters
         are present. Limited to the 100 most recent messages in the guild.
     """
 
@@ -43,55 +138,174 @@ class SpawnCooldown:
     # initialize partially started, to reduce the dead time after starting the bot
     amount: float = field(default=SPAWN_CHANCE_RANGE[0] // 2)
     chance: int = field(default_factory=lambda: random.randint(*SPAWN_CHANCE_RANGE))
-    lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
-    message_cache: deque[CachedMessage] = field(default_factory=lambda: deque(maxlen=100))
+    counted_at: float | None = field(default=None, init=False)
+    # the module's clock is looked up on each call, the simulator replaces it
+    last_message: float = field(default_factory=lambda: monotonic(), init=False)
+    message_cache: MessageCache = field(default_factory=MessageCache)
 
     def reset(self, time: datetime):
         self.amount = 1.0
         self.chance = random.randint(*SPAWN_CHANCE_RANGE)
-        try:
-            self.lock.release()
-        except RuntimeError:  # lock is not acquired
-            pass
+        self.counted_at = None
         self.time = time
 
-    async def increase(self, message: discord.Message) -> bool:
-        # this is a deque, not a list
-        # its property is that, once the max length is reached (100 for us),
-        # the oldest element is removed, thus we only have the last 100 messages in memory
+    @property
+    def on_cooldown(self) -> bool:
+        """
+        Whether messages are currently ignored because one was counted recently.
+        """
+        return self.counted_at is not None and monotonic() - self.counted_at < MESSAGE_COOLDOWN
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self.message_cache)
+
+    def increase(self, message: discord.Message) -> bool:
+        # once the max length is reached (100 for us), the oldest element is removed,
+        # thus we only have the last 100 messages in memory
         self.message_cache.append(
-            CachedMessage(content=message.content, author_id=message.author.id)
+            CachedMessage(length=len(message.content), author_id=message.author.id)
         )
 
-        if self.lock.locked():
+        self.last_message = monotonic()
+        if self.on_cooldown:
             return False
+        self.counted_at = self.last_message
 
-        async with self.lock:
-            amount = 1
-            if message.guild.member_count < 5 or message.guild.member_count > 1000:  # type: ignore
-                amount /= 2
-            if len(message.content) < 5:
-                amount /= 2
-            if len(set(x.author_id for x in self.message_cache)) < 4 or (
-                len(list(filter(lambda x: x.author_id == message.author.id, self.message_cache)))
-                / self.message_cache.maxlen  # type: ignore
-                > 0.4
-            ):
-                amount /= 2
-            self.amount += amount
-            await asyncio.sleep(10)
+        amount = 1
+        if message.guild.member_count < 5 or message.guild.member_count > 1000:  # type: ignore
+            amount /= 2
+        if len(message.content) < 5:
+            amount /= 2
+        if (
+            self.message_cache.chatters < 4
+            or self.message_cache.authors[message.author.id] / self.message_cache.maxlen > 0.4
+        ):
+            amount /= 2
+        self.amount += amount
         return True
 
 
+class SpawnQueue:
+    """
+    Sends spawn messages in the background, so that handling messages never waits on Discord.
+
+    Spawns of the same channel are sent one at a time in order, while up to `workers` channels
+    are served concurrently. A channel being rate limited by Discord only holds its worker.
+
+    Attributes
+    ----------
+    workers: int
+        Maximum number of spawns being sent at once.
+    channels: dict[int, ~collections.deque[tuple[discord.TextChannel, CountryBall, float]]]
+        Spawns waiting to be sent per channel ID, with the monotonic time they were queued.
+        A channel with a spawn being sent stays present, even with no spawn left.
+    """
+
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+        self.channels: dict[int, deque[tuple[discord.TextChannel, CountryBall, float]]] = {}
+        self.ready: asyncio.Queue[int] = asyncio.Queue()
+        self.tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return sum(len(x) for x in self.channels.values())
+
+    def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        """
+        Stop the workers, dropping the spawns not sent yet.
+        """
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        spawn_queue_size.dec(len(self))
+        self.channels.clear()
+        self.ready = asyncio.Queue()
+
+    def push(self, channel: discord.TextChannel, ball: CountryBall):
+        """
+        Queue a spawn, starting the workers if needed.
+        """
+        self.start()
+        job = (channel, ball, monotonic())
+        jobs = self.channels.get(channel.id)
+        if jobs is not None:
+            # the channel is already queued or being served, this spawn will be sent after
+            jobs.append(job)
+        else:
+            self.channels[channel.id] = deque((job,))
+            self.ready.put_nowait(channel.id)
+        spawn_queue_size.inc()
+
+    async def worker(self):
+        while True:
+            channel_id = await self.ready.get()
+            jobs = self.channels[channel_id]
+            channel, ball, queued_at = jobs.popleft()
+            spawn_queue_wait.observe(monotonic() - queued_at)
+            try:
+                await ball.spawn(channel)
+            except Exception:
+                log.error(f"Failed to spawn ball in channel {channel_id}", exc_info=True)
+            finally:
+                spawn_queue_size.dec()
+                if jobs:
+                    # back of the line, other channels are not starved by a busy one
+                    self.ready.put_nowait(channel_id)
+                else:
+                    del self.channels[channel_id]
+
+
 @dataclass
 class SpawnManager:
+    """
+    Attributes
+    ----------
+    cooldowns: dict[int, SpawnCooldown]
+        Spawn state of each guild ID that sent messages recently.
+    cache: dict[int, int]
+        Spawn channel ID of each guild ID with spawns enabled.
+    idle_ttl: int
+        Number of seconds without messages after which the state of a guild is dropped. 0 keeps
+        them forever. A dropped guild starts over with a new spawn cooldown, so this lowers the
+        spawn rate of guilds less active than this.
+    queue: SpawnQueue
+        The spawns waiting to be sent.
+    """
+
     cooldowns: dict[int, SpawnCooldown] = field(default_factory=dict)
     cache: dict[int, int] = field(default_factory=dict)
+    idle_ttl: int = field(default_factory=lambda: settings.spawn_idle_ttl)
+    last_sweep: float = field(default_factory=lambda: monotonic(), init=False)
+    queue: SpawnQueue = field(default_factory=lambda: SpawnQueue(settings.spawn_workers))
+
+    def evict_idle(self):
+        """
+        Forget the state of the guilds idle for more than `idle_ttl`, and update the metrics.
+        """
+        now = monotonic()
+        self.last_sweep = now
+        if self.idle_ttl:
+            idle = [k for k, v in self.cooldowns.items() if now - v.last_message > self.idle_ttl]
+            for guild_id in idle:
+                del self.cooldowns[guild_id]
+            if idle:
+                log.debug(f"Dropped the spawn state of {len(idle)} idle guilds.")
+        spawn_guilds.set(len(self.cooldowns))
+        if self.cooldowns:
+            memory = sum(sys.getsizeof(x) for x in self.cooldowns.values())
+            spawn_guild_memory.set(memory / len(self.cooldowns))
 
     async def handle_message(self, message: discord.Message):
         guild = message.guild
         if not guild:
             return
+        if monotonic() - self.last_sweep > SWEEP_INTERVAL:
+            self.evict_idle()
 
         cooldown = self.cooldowns.get(guild.id, None)
         if not cooldown:
@@ -112,8 +326,8 @@ class SpawnManager:
             multiplier = 0.2
         chance = cooldown.chance - multiplier * (delta // 60)
 
-        # manager cannot be increased more than once per 5 seconds
-        if not await cooldown.increase(message):
+        # manager cannot be increased more than once per 10 seconds
+        if not cooldown.increase(message):
             return
 
         # normal increase, need to reach goal
@@ -136,4 +350,4 @@ class SpawnManager:
             del self.cache[guild.id]
             return
         ball = await CountryBall.get_random()
-        await ball.spawn(cast(discord.TextChannel, channel))
+        self.queue.push(cast(discord.TextChannel, channel), ball)
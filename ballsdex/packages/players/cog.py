@@ -11,7 +11,7 @@ from tortoise.expressions import Q
 
 from ballsdex.core.models import BallInstance, Block, DonationPolicy, Friendship, MentionPolicy
 from ballsdex.core.models import Player as PlayerModel
-from ballsdex.core.models import PrivacyPolicy, Trade, TradeObject, balls
+from ballsdex.core.models import PrivacyPolicy, Trade, TradeObject, balls, inventories, players
 from ballsdex.core.utils.buttons import ConfirmChoiceView
 from ballsdex.core.utils.paginator import FieldPageSource, Pages
 from ballsdex.settings import settings
@@ -55,14 +55,13 @@ class Player(commands.GroupCog):
         policy: PrivacyPolicy
             The new privacy policy to choose.
         """
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         if policy == PrivacyPolicy.SAME_SERVER and not self.bot.intents.members:
             await interaction.response.send_message(
                 "I need the `members` intent to use this policy.", ephemeral=True
             )
             return
-        player.privacy_policy = PrivacyPolicy(policy.value)
-        await player.save()
+        await players.update(player, privacy_policy=PrivacyPolicy(policy.value))
         await interaction.response.send_message(
             f"Your privacy policy has been set to **{policy.name}**.", ephemeral=True
         )
@@ -89,8 +88,13 @@ class Player(commands.GroupCog):
         policy: DonationPolicy
             The new policy for accepting donations
         """
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player.donation_policy = DonationPolicy(policy.value)
+        try:
+            donation_policy = DonationPolicy(policy.value)
+        except ValueError:
+            await interaction.response.send_message("Invalid input!", ephemeral=True)
+            return
+        player = await players.get_or_create(interaction.user.id)
+        await players.update(player, donation_policy=donation_policy)
         if policy.value == DonationPolicy.ALWAYS_ACCEPT:
             await interaction.response.send_message(
                 "Setting updated, you will now receive all donated "
@@ -115,10 +119,6 @@ class Player(commands.GroupCog):
                 "added as friends in the bot.",
                 ephemeral=True,
             )
-        else:
-            await interaction.response.send_message("Invalid input!", ephemeral=True)
-            return
-        await player.save()  # do not save if the input is invalid
 
     @mention.command(name="policy")
     @app_commands.choices(
@@ -136,9 +136,8 @@ class Player(commands.GroupCog):
         policy: MentionPolicy
             The new policy for mentions
         """
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player.mention_policy = policy
-        await player.save()
+        player = await players.get_or_create(interaction.user.id)
+        await players.update(player, mention_policy=policy)
         await interaction.response.send_message(
             f"Your mention policy has been set to **{policy.name.lower()}**.", ephemeral=True
         )
@@ -155,8 +154,10 @@ class Player(commands.GroupCog):
         await view.wait()
         if view.value is None or not view.value:
             return
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
         await player.delete()
+        players.invalidate(player.discord_id)
+        inventories.invalidate(player.pk)
 
     @friend.command(name="add")
     async def friend_add(self, interaction: discord.Interaction, user: discord.User):
@@ -168,8 +169,8 @@ class Player(commands.GroupCog):
         user: discord.User
             The user you want to add as a friend.
         """
-        player1, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player2, _ = await PlayerModel.get_or_create(discord_id=user.id)
+        player1 = await players.get_or_create(interaction.user.id)
+        player2 = await players.get_or_create(user.id)
 
         if player1 == player2:
             await interaction.response.send_message(
@@ -231,8 +232,8 @@ class Player(commands.GroupCog):
         user: discord.User
             The user you want to remove as a friend.
         """
-        player1, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player2, _ = await PlayerModel.get_or_create(discord_id=user.id)
+        player1 = await players.get_or_create(interaction.user.id)
+        player2 = await players.get_or_create(user.id)
 
         if player1 == player2:
             await interaction.response.send_message("You cannot remove yourself.", ephemeral=True)
@@ -261,7 +262,7 @@ class Player(commands.GroupCog):
         """
         View all your friends.
         """
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
 
         friendships = (
             await Friendship.filter(Q(player1=player) | Q(player2=player))
@@ -306,8 +307,8 @@ class Player(commands.GroupCog):
         user: discord.User
             The user you want to block.
         """
-        player1, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player2, _ = await PlayerModel.get_or_create(discord_id=user.id)
+        player1 = await players.get_or_create(interaction.user.id)
+        player2 = await players.get_or_create(user.id)
 
         await interaction.response.defer(ephemeral=True, thinking=True)
 
@@ -354,8 +355,8 @@ class Player(commands.GroupCog):
         user: discord.User
             The user you want to unblock.
         """
-        player1, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
-        player2, _ = await PlayerModel.get_or_create(discord_id=user.id)
+        player1 = await players.get_or_create(interaction.user.id)
+        player2 = await players.get_or_create(user.id)
 
         if player1 == player2:
             await interaction.response.send_message("You cannot unblock yourself.", ephemeral=True)
@@ -380,7 +381,7 @@ class Player(commands.GroupCog):
         """
         View all the users you have blocked.
         """
-        player, _ = await PlayerModel.get_or_create(discord_id=interaction.user.id)
+        player = await players.get_or_create(interaction.user.id)
 
         blocked_relations = (
             await Block.filter(player1=player).select_related("player1", "player2").all()
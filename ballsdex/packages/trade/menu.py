@@ -9,7 +9,7 @@ import discord
 from discord.ui import Button, View, button
 from discord.utils import format_dt, utcnow
 
-from ballsdex.core.models import BallInstance, Player, Trade, TradeObject
+from ballsdex.core.models import BallInstance, Trade, TradeObject, inventories, players
 from ballsdex.core.utils import menus
 from ballsdex.core.utils.paginator import Pages
 from ballsdex.packages.balls.countryballs_paginator import CountryballsViewer
@@ -306,6 +306,7 @@ class TradeMenu:
         for countryball in valid_transferable_countryballs:
             await countryball.unlock()
             await countryball.save()
+            inventories.remove(countryball, countryball.trade_player_id)
 
     async def confirm(self, trader: TradingUser) -> bool:
         """
@@ -529,7 +530,7 @@ class TradeViewMenu(Pages):
     async def select_player_menu(
         self, interaction: discord.Interaction["BallsDexBot"], item: discord.ui.Select
     ):
-        player = await Player.get(discord_id=int(item.values[0]))
+        player = await players.fetch(int(item.values[0]))
         trade, trader = self.cog.get_trade(interaction)
         if trade is None or trader is None:
             return await interaction.followup.send(
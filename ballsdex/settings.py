@@ -56,6 +56,41 @@ class Settings:
         List of roles that have full access to the /admin command
     admin_role_ids: list[int]
         List of roles that have partial access to the /admin command (only blacklist and guilds)
+    card_cache_size: int
+        Memory used to keep recently rendered cards, in megabytes
+    card_cache_directory: str | None
+        Directory where rendered cards are also saved to be kept across restarts
+    card_cache_directory_size: int
+        Disk space used by the card cache directory, in megabytes, 0 for no limit
+    render_pool_type: str
+        Either "thread" or "process", type of the workers rendering cards
+    render_pool_workers: int | None
+        Number of workers rendering cards, defaults to the number of CPUs
+    render_queue_size: int
+        Maximum number of cards waiting to be rendered before users are asked to retry later
+    asset_cache_size: int
+        Memory used to keep decoded card assets, in megabytes, divided between the processes
+    base_layer_cache_size: int
+        Memory used to keep cards drawn without their stats, in megabytes, divided between the
+        processes
+    text_cache_size: int
+        Memory used to keep rasterized card texts, in megabytes, divided between the processes
+    card_format: str
+        Format of the cards sent on Discord, "png", "webp" or "jpeg"
+    card_quality: int
+        Encoding quality of the cards sent on Discord, ignored for PNG
+    card_scale: float
+        Size factor of the cards sent on Discord, between 0 and 1
+    card_warmup: bool
+        Pre-render the most common cards in the background after loading the cache, only with
+        thread workers
+    spawn_idle_ttl: int
+        Number of seconds without messages after which the spawn state of a guild is dropped,
+        0 to keep it forever. Dropping it resets the guild's spawn progress
+    spawn_workers: int
+        Maximum number of spawn messages being sent at once
+    autocomplete_deadline: float
+        Number of seconds after which autocompletion returns the results found so far
     """
 
     bot_token: str = ""
@@ -94,6 +129,28 @@ class Settings:
     prometheus_host: str = "0.0.0.0"
     prometheus_port: int = 15260
 
+    # card rendering
+    card_cache_size: int = 128
+    card_cache_directory: str | None = None
+    card_cache_directory_size: int = 1024
+    render_pool_type: str = "thread"
+    render_pool_workers: int | None = None
+    render_queue_size: int = 50
+    asset_cache_size: int = 256
+    base_layer_cache_size: int = 384
+    text_cache_size: int = 64
+    card_format: str = "png"
+    card_quality: int = 90
+    card_scale: float = 1.0
+    card_warmup: bool = False
+
+    # spawn manager
+    spawn_idle_ttl: int = 0
+    spawn_workers: int = 8
+
+    # autocompletion
+    autocomplete_deadline: float = 1.5
+
 
 settings = Settings()
 
@@ -134,6 +191,28 @@ def read_settings(path: "Path"):
     settings.max_favorites = content.get("max-favorites", 50)
     settings.max_attack_bonus = content.get("max-attack-bonus", 20)
     settings.max_health_bonus = content.get("max-health-bonus", 20)
+
+    card_rendering = content.get("card-rendering") or {}
+    settings.card_cache_size = card_rendering.get("cache-size", 128)
+    settings.card_cache_directory = card_rendering.get("cache-directory")
+    settings.card_cache_directory_size = card_rendering.get("cache-directory-size", 1024)
+    settings.render_pool_type = card_rendering.get("pool-type", "thread")
+    settings.render_pool_workers = card_rendering.get("workers")
+    settings.render_queue_size = card_rendering.get("max-queue", 50)
+    settings.asset_cache_size = card_rendering.get("asset-cache-size", 256)
+    settings.base_layer_cache_size = card_rendering.get("base-layer-cache-size", 384)
+    settings.text_cache_size = card_rendering.get("text-cache-size", 64)
+    settings.card_format = card_rendering.get("format", "png")
+    settings.card_quality = card_rendering.get("quality", 90)
+    settings.card_scale = card_rendering.get("scale", 1.0)
+    settings.card_warmup = card_rendering.get("warmup", False)
+
+    spawn_manager = content.get("spawn-manager") or {}
+    settings.spawn_idle_ttl = spawn_manager.get("idle-ttl", 0)
+    settings.spawn_workers = spawn_manager.get("workers", 8)
+
+    autocomplete = content.get("autocomplete") or {}
+    settings.autocomplete_deadline = autocomplete.get("deadline", 1.5)
     log.info("Settings loaded.")
 
 
@@ -224,6 +303,69 @@ prometheus:
   enabled: false
   host: "0.0.0.0"
   port: 15260
+
+# card rendering options, the default values are fine for most bots
+card-rendering:
+
+  # memory used to keep recently rendered cards, in megabytes
+  cache-size: 128
+
+  # optional directory where rendered cards are also saved, to keep them across restarts
+  cache-directory:
+
+  # disk space used by the cache directory, in megabytes, the least recently used cards are
+  # deleted when exceeded, 0 for no limit
+  cache-directory-size: 1024
+
+  # "thread" or "process", processes avoid slowing down the bot while rendering but use
+  # more memory
+  pool-type: thread
+
+  # number of cards rendered in parallel, leave empty to use the number of CPUs
+  workers:
+
+  # maximum number of cards waiting to be rendered, users are asked to retry when exceeded
+  max-queue: 50
+
+  # memory used to keep decoded images, cards drawn without their stats and rasterized texts,
+  # in megabytes. With the process pool type, these are divided between the processes
+  asset-cache-size: 256
+  base-layer-cache-size: 384
+  text-cache-size: 64
+
+  # format of the cards sent on Discord: png, webp or jpeg (no transparency)
+  # jpeg is the fastest to encode, webp gives the smallest files, the admin panel always
+  # exports lossless PNG. Compare them with "python3 -m ballsdex.core.image_generator.benchmark"
+  format: png
+
+  # encoding quality between 1 and 100, ignored for png
+  quality: 90
+
+  # size factor of the cards sent on Discord, between 0 and 1
+  scale: 1.0
+
+  # pre-render the most common cards in the background after startup, only with the thread
+  # pool type
+  warmup: false
+
+# spawn system options
+spawn-manager:
+
+  # number of seconds without messages after which a guild's spawn progress is forgotten
+  # to free memory, 0 keeps it forever. Guilds sending fewer messages than this will start
+  # over after each idle period and spawn less often, only enable this for very large bots
+  idle-ttl: 0
+
+  # maximum number of spawn messages being sent at once, spawns in the same channel are
+  # always sent one after the other
+  workers: 8
+
+# autocompletion options
+autocomplete:
+
+  # number of seconds after which the results found so far are returned, Discord fails the
+  # autocompletion after 3 seconds
+  deadline: 1.5
   """  # noqa: W291
     )
 
@@ -237,6 +379,9 @@ def update_settings(path: "Path"):
     add_max_attack = "max-attack-bonus" not in content
     add_max_health = "max-health-bonus" not in content
     add_plural_collectible = "plural-collectible-name" not in content
+    add_card_rendering = "card-rendering:" not in content
+    add_spawn_manager = "spawn-manager:" not in content
+    add_autocomplete = "autocomplete:" not in content
 
     for line in content.splitlines():
         if line.startswith("owners:"):
@@ -285,5 +430,77 @@ max-health-bonus: 20
 plural-collectible-name: countryballs
 """
 
-    if any((add_owners, add_config_ref)):
+    if add_card_rendering:
+        content += """
+# card rendering options, the default values are fine for most bots
+card-rendering:
+
+  # memory used to keep recently rendered cards, in megabytes
+  cache-size: 128
+
+  # optional directory where rendered cards are also saved, to keep them across restarts
+  cache-directory:
+
+  # disk space used by the cache directory, in megabytes, the least recently used cards are
+  # deleted when exceeded, 0 for no limit
+  cache-directory-size: 1024
+
+  # "thread" or "process", processes avoid slowing down the bot while rendering but use
+  # more memory
+  pool-type: thread
+
+  # number of cards rendered in parallel, leave empty to use the number of CPUs
+  workers:
+
+  # maximum number of cards waiting to be rendered, users are asked to retry when exceeded
+  max-queue: 50
+
+  # memory used to keep decoded images, cards drawn without their stats and rasterized texts,
+  # in megabytes. With the process pool type, these are divided between the processes
+  asset-cache-size: 256
+  base-layer-cache-size: 384
+  text-cache-size: 64
+
+  # format of the cards sent on Discord: png, webp or jpeg (no transparency)
+  # jpeg is the fastest to encode, webp gives the smallest files, the admin panel always
+  # exports lossless PNG. Compare them with "python3 -m ballsdex.core.image_generator.benchmark"
+  format: png
+
+  # encoding quality between 1 and 100, ignored for png
+  quality: 90
+
+  # size factor of the cards sent on Discord, between 0 and 1
+  scale: 1.0
+
+  # pre-render the most common cards in the background after startup, only with the thread
+  # pool type
+  warmup: false
+"""
+
+    if add_spawn_manager:
+        content += """
+# spawn system options
+spawn-manager:
+
+  # number of seconds without messages after which a guild's spawn progress is forgotten
+  # to free memory, 0 keeps it forever. Guilds sending fewer messages than this will start
+  # over after each idle period and spawn less often, only enable this for very large bots
+  idle-ttl: 0
+
+  # maximum number of spawn messages being sent at once, spawns in the same channel are
+  # always sent one after the other
+  workers: 8
+"""
+
+    if add_autocomplete:
+        content += """
+# autocompletion options
+autocomplete:
+
+  # number of seconds after which the results found so far are returned, Discord fails the
+  # autocompletion after 3 seconds
+  deadline: 1.5
+"""
+
+    if any((add_owners, add_config_ref, add_card_rendering, add_spawn_manager, add_autocomplete)):
         path.write_text(content)
@@ -0,0 +1,10 @@
+-- upgrade --
+CREATE INDEX "idx_ballinstanc_player__0a7386" ON "ballinstance" ("player_id", "ball_id");
+-- not generated by aerich: trigram index on the hexadecimal IDs for the autocompletion, which
+-- must keep filtering on the exact same expression. pg_trgm can be created by the owner of
+-- the database since PostgreSQL 13, older servers need a superuser to run this migration
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "idx_ballinstanc_id_hex_trgm" ON "ballinstance" USING GIN (to_hex("id") gin_trgm_ops);
+-- downgrade --
+DROP INDEX "idx_ballinstanc_player__0a7386";
+DROP INDEX IF EXISTS "idx_ballinstanc_id_hex_trgm";
@@ -0,0 +1,40 @@
+import asyncio
+from typing import AsyncIterator
+
+from discord import app_commands
+
+from ballsdex.core.utils.transformers import ModelTransformer
+from ballsdex.settings import settings
+
+
+class SlowTransformer(ModelTransformer):
+    """
+    Finds two options right away, then hangs like a slow database query.
+    """
+
+    name = "slow"
+
+    async def get_options(self, interaction, value: str) -> AsyncIterator[app_commands.Choice]:
+        yield app_commands.Choice(name="France", value="1")
+        yield app_commands.Choice(name="Germany", value="2")
+        await asyncio.sleep(60)
+        yield app_commands.Choice(name="Italy", value="3")
+
+
+class ManyTransformer(ModelTransformer):
+    name = "many"
+
+    async def get_options(self, interaction, value: str) -> AsyncIterator[app_commands.Choice]:
+        for i in range(100):
+            yield app_commands.Choice(name=str(i), value=str(i))
+
+
+def test_deadline_returns_options_found_so_far(monkeypatch):
+    monkeypatch.setattr(settings, "autocomplete_deadline", 0.05)
+    choices = asyncio.run(SlowTransformer().autocomplete(None, "a"))  # type: ignore
+    assert [x.value for x in choices] == ["1", "2"]
+
+
+def test_options_are_limited():
+    choices = asyncio.run(ManyTransformer().autocomplete(None, ""))  # type: ignore
+    assert len(choices) == 25
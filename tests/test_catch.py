@@ -0,0 +1,58 @@
+import asyncio
+
+from tortoise import Tortoise
+
+from ballsdex.core.models import Ball, BallInstance, Player, Regime, players
+
+
+async def create_ball(regime: Regime, country: str) -> Ball:
+    return await Ball.create(
+        country=country,
+        regime=regime,
+        health=100,
+        attack=100,
+        rarity=1,
+        emoji_id=10**17,
+        wild_card="/wild.png",
+        collection_card="/card.png",
+        credits="Author",
+        capacity_name="Capacity",
+        capacity_description="Description",
+    )
+
+
+async def check_catch(db_url: str):
+    await Tortoise.init(
+        db_url=db_url, modules={"models": ["ballsdex.core.models"]}, _create_db=True
+    )
+    players.clear()
+    try:
+        await Tortoise.generate_schemas()
+        regime = await Regime.create(name="Democracy", background="/democracy.png")
+        france = await create_ball(regime, "France")
+        germany = await create_ball(regime, "Germany")
+
+        instance, player, is_new = await BallInstance.catch(10**17, france, attack_bonus=5)
+        assert is_new
+        assert instance.player_id == player.pk and instance.ball_id == france.pk
+        assert instance.attack_bonus == 5
+        assert await players.get(10**17) is player
+
+        _, same_player, is_new = await BallInstance.catch(10**17, france)
+        assert not is_new and same_player is player
+        _, _, is_new = await BallInstance.catch(10**17, germany)
+        assert is_new
+
+        # a new user catching several balls at once is only created once
+        results = await asyncio.gather(*(BallInstance.catch(10**17 + 1, france) for _ in range(5)))
+        assert await Player.filter(discord_id=10**17 + 1).count() == 1
+        assert len({player.pk for _, player, _ in results}) == 1
+        assert any(is_new for _, _, is_new in results)
+        assert await BallInstance.filter(player__discord_id=10**17 + 1).count() == 5
+    finally:
+        players.clear()
+        await Tortoise._drop_databases()
+
+
+def test_catch(db_url: str):
+    asyncio.run(check_catch(db_url))
@@ -0,0 +1,66 @@
+import asyncio
+
+from tortoise import Tortoise
+
+from ballsdex.core.models import Ball, BallInstance, InventoryCache, Player, Regime, inventories
+
+
+async def check_inventories(db_url: str):
+    await Tortoise.init(
+        db_url=db_url, modules={"models": ["ballsdex.core.models"]}, _create_db=True
+    )
+    inventories.clear()
+    try:
+        await Tortoise.generate_schemas()
+        regime = await Regime.create(name="Democracy", background="/democracy.png")
+        ball = await Ball.create(
+            country="France",
+            regime=regime,
+            health=100,
+            attack=100,
+            rarity=1,
+            emoji_id=10**17,
+            wild_card="/wild.png",
+            collection_card="/card.png",
+            credits="Author",
+            capacity_name="Capacity",
+            capacity_description="Description",
+        )
+        alice = await Player.create(discord_id=10**17)
+        bob = await Player.create(discord_id=10**17 + 1)
+        for _ in range(3):
+            await BallInstance.create(ball=ball, player=alice)
+
+        alice_inventory = await inventories.get(alice.pk)
+        bob_inventory = await inventories.get(bob.pk)
+        assert alice_inventory is not None and len(alice_inventory) == 3
+        assert bob_inventory == {}
+
+        # saves only update the owner's inventory, moves also need the previous owner
+        instance = await BallInstance.get(pk=next(iter(alice_inventory)))
+        instance.favorite = True
+        await instance.save()
+        assert alice_inventory[instance.pk].favorite
+        instance.player = bob
+        instance.trade_player = alice
+        await instance.save()
+        inventories.remove(instance, instance.trade_player_id)
+        assert instance.pk not in alice_inventory
+        assert instance.pk in bob_inventory
+
+        # the bound counts instances, not inventories
+        cache = InventoryCache(maxsize=3, ttl=60, max_items=3)
+        assert await cache.get(alice.pk) is not None
+        assert await cache.get(bob.pk) is not None
+        assert len(cache) == 2
+        await BallInstance.create(ball=ball, player=bob)
+        cache.invalidate(bob.pk)
+        assert len(await cache.get(bob.pk) or ()) == 2
+        assert len(cache) == 1
+    finally:
+        inventories.clear()
+        await Tortoise._drop_databases()
+
+
+def test_inventories(db_url: str):
+    asyncio.run(check_inventories(db_url))
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import timedelta
+
+from ballsdex.packages.countryballs import spawn
+from ballsdex.packages.countryballs.simulator import (
+    START,
+    SimulatedSpawnManager,
+    SyntheticGuild,
+    SyntheticMember,
+    SyntheticMessage,
+    VirtualClock,
+)
+
+
+def make_message(guild: SyntheticGuild, now: float) -> SyntheticMessage:
+    return SyntheticMessage(
+        guild, SyntheticMember(guild.id * 10), "hello there", START + timedelta(seconds=now)
+    )
+
+
+async def replay(idle_ttl: int, messages: list[tuple[float, SyntheticMessage]]):
+    with VirtualClock() as clock:
+        manager = SimulatedSpawnManager(idle_ttl=idle_ttl)
+        for now, message in messages:
+            clock.now = now
+            await manager.handle_message(message)  # type: ignore
+    return manager
+
+
+def test_virtual_clock_is_restored():
+    monotonic = spawn.monotonic
+    with VirtualClock() as clock:
+        clock.now = 42
+        assert spawn.monotonic() == 42
+        assert spawn.SpawnCooldown(START).last_message == 42
+        assert SimulatedSpawnManager(idle_ttl=0).last_sweep == 42
+    assert spawn.monotonic is monotonic
+
+
+def test_idle_guild_is_evicted_under_virtual_clock():
+    quiet = SyntheticGuild(1, 50)
+    busy = SyntheticGuild(2, 50)
+    later = 3600 + spawn.SWEEP_INTERVAL + 1
+    manager = asyncio.run(
+        replay(3600, [(0, make_message(quiet, 0)), (later, make_message(busy, later))])
+    )
+    assert manager.evicted == 1
+    assert manager.last_sweep == later
+    assert quiet.id not in manager.cooldowns
+    assert busy.id in manager.cooldowns
+
+
+def test_active_guild_is_kept_under_virtual_clock():
+    guild = SyntheticGuild(1, 50)
+    messages = [(now, make_message(guild, now)) for now in range(0, 4 * 3600, 600)]
+    manager = asyncio.run(replay(3600, messages))
+    assert manager.evicted == 0
+    assert guild.id in manager.cooldowns
+
+
+def test_eviction_disabled():
+    quiet = SyntheticGuild(1, 50)
+    busy = SyntheticGuild(2, 50)
+    later = 10 * 3600
+    manager = asyncio.run(
+        replay(0, [(0, make_message(quiet, 0)), (later, make_message(busy, later))])
+    )
+    assert manager.evicted == 0
+    assert quiet.id in manager.cooldowns